@@ -1,6 +1,15 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
+from .archive import delete_artisan, delete_product
 from .models import User, Artisan, Product, Order, OrderItem
+from .pagination import EstimatedCountPaginator
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    # Estimated counts instead of COUNT(*) per page, and no second count of
+    # the unfiltered table for the "N total" link.
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 @admin.register(User)
 class CustomUserAdmin(UserAdmin):
@@ -27,6 +36,18 @@ class CustomUserAdmin(UserAdmin):
         }),
     )
 
+    # A user's artisan profile, and with it their products, would otherwise
+    # go in one cascade; see api/archive.py.
+    def delete_model(self, request, obj):
+        for artisan in Artisan.objects.filter(user=obj):
+            delete_artisan(artisan)
+        super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        for artisan in Artisan.objects.filter(user__in=queryset):
+            delete_artisan(artisan)
+        super().delete_queryset(request, queryset)
+
 
 @admin.register(Artisan)
 class ArtisanAdmin(admin.ModelAdmin):
@@ -34,23 +55,50 @@ class ArtisanAdmin(admin.ModelAdmin):
     search_fields = ['business_name', 'description', 'location']
     list_filter = ['location', 'created_at']
 
+    def delete_model(self, request, obj):
+        delete_artisan(obj)
+
+    def delete_queryset(self, request, queryset):
+        for artisan in queryset:
+            delete_artisan(artisan)
+
 
 @admin.register(Product)
-class ProductAdmin(admin.ModelAdmin):
+class ProductAdmin(LargeTableAdmin):
     list_display = ['name', 'artisan', 'price', 'inventory']
+    list_select_related = ['artisan']
     search_fields = ['name', 'description', 'artisan__business_name']
-    list_filter = ['artisan', 'created_at']
+    # Filtering by artisan rendered every artisan in the sidebar; search
+    # by business name instead.
+    list_filter = ['created_at']
+    autocomplete_fields = ['artisan']
+    ordering = ['-created_at', '-id']
+
+    # Detach order lines in batches instead of one SET NULL cascade.
+    def delete_model(self, request, obj):
+        delete_product(obj)
+
+    def delete_queryset(self, request, queryset):
+        for product in queryset:
+            delete_product(product)
 
 
 @admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
+class OrderAdmin(LargeTableAdmin):
     list_display = ['id', 'user', 'status', 'total_amount', 'created_at']
+    list_select_related = ['user']
     list_filter = ['status', 'created_at']
     search_fields = ['user__email']  # Changed from user__username to user__email
+    autocomplete_fields = ['user']
+    ordering = ['-created_at', '-id']
 
 
 @admin.register(OrderItem)
-class OrderItemAdmin(admin.ModelAdmin):
+class OrderItemAdmin(LargeTableAdmin):
     list_display = ['order', 'product', 'quantity', 'price']
-    search_fields = ['order__id', 'product__name']
-    list_filter = ['order__status']
\ No newline at end of file
+    # Order.__str__ reads the user.
+    list_select_related = ['order__user', 'product']
+    search_fields = ['order__id', 'product_name']
+    list_filter = ['order__status']
+    autocomplete_fields = ['order', 'product']
+    ordering = ['-pk']
\ No newline at end of file
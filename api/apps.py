@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        # Register background tasks with the job queue.
+        from . import tasks  # noqa: F401
+        # Connect the change feed signal receivers.
+        from . import changes  # noqa: F401
@@ -0,0 +1,95 @@
+"""
+Order archival and history-safe product deletion.
+
+Closed orders older than ORDER_ARCHIVE_AFTER_DAYS are moved into
+ArchivedOrder one bounded batch per transaction, so Order/OrderItem and
+their indexes only hold recent orders. Archived orders keep their ids and
+are still served by /orders/archived/.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .changes import deletes_recorded_as
+from .models import ArchivedOrder, ChangeEvent, CoPurchase, Order, OrderItem, RelatedProduct
+
+CLOSED_STATUSES = ['delivered', 'cancelled']
+
+
+def _archived_item(item):
+    # Same shape as OrderItemSerializer output.
+    return {
+        'id': str(item.id),
+        'product': str(item.product_id) if item.product_id else None,
+        'product_name': item.product_name,
+        'quantity': item.quantity,
+        'price': str(item.price),
+    }
+
+
+def archive_orders(days=None, batch_size=500):
+    """
+    Move closed orders created more than `days` ago into ArchivedOrder.
+    Returns the number of orders archived.
+    """
+    days = settings.ORDER_ARCHIVE_AFTER_DAYS if days is None else days
+    cutoff = timezone.now() - timedelta(days=days)
+    archived = 0
+    while True:
+        with transaction.atomic(), deletes_recorded_as(ChangeEvent.ARCHIVED):
+            orders = list(
+                Order.objects.select_for_update(skip_locked=True)
+                .filter(status__in=CLOSED_STATUSES, created_at__lt=cutoff)
+                .order_by('created_at', 'id')
+                .prefetch_related('items')[:batch_size]
+            )
+            if not orders:
+                return archived
+            ArchivedOrder.objects.bulk_create([
+                ArchivedOrder(
+                    id=order.id, user_id=order.user_id, status=order.status,
+                    total_amount=order.total_amount, created_at=order.created_at,
+                    updated_at=order.updated_at,
+                    items=[_archived_item(item) for item in order.items.all()],
+                )
+                for order in orders
+            ])
+            Order.objects.filter(pk__in=[order.pk for order in orders]).delete()
+        archived += len(orders)
+
+
+def _in_batches(queryset, batch_size, apply):
+    while True:
+        with transaction.atomic():
+            ids = list(queryset.values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                return
+            apply(queryset.model.objects.filter(pk__in=ids))
+
+
+def delete_product(product, batch_size=1000):
+    """
+    Delete `product` without one large transaction: its order lines are
+    detached (they keep product_name) and its recommendation rows removed
+    in batches first. Consumers of the change feed learn about detached
+    lines from the product's delete event.
+    """
+    _in_batches(OrderItem.objects.filter(product=product), batch_size,
+                lambda batch: batch.update(product=None))
+    for queryset in (CoPurchase.objects.filter(Q(product=product) | Q(other=product)),
+                     RelatedProduct.objects.filter(Q(product=product) | Q(related=product))):
+        _in_batches(queryset, batch_size, lambda batch: batch.delete())
+    product.delete()
+
+
+def delete_artisan(artisan, batch_size=1000):
+    """
+    Delete `artisan`, removing each of its products with delete_product()
+    first rather than in one cascade.
+    """
+    for product in artisan.products.all():
+        delete_product(product, batch_size)
+    artisan.delete()
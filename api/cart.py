@@ -0,0 +1,152 @@
+"""
+Cart inventory holds.
+
+Adding to a cart moves units from available to reserved with a single
+conditional UPDATE, so oversold products are rejected there, cheaply,
+instead of at checkout. Holds expire after CART_HOLD_SECONDS and are
+released in batches by `release_expired_holds()`. Holds only move units
+between available and reserved, so they are not recorded in the change
+feed; checkout, which sells them, is.
+"""
+from collections import Counter
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from django.db.models import Case, F, PositiveIntegerField, Q, Value, When
+from django.utils import timezone
+from rest_framework import serializers
+
+from . import tasks
+from .changes import record_changes
+from .jobs import enqueue
+from .models import Cart, CartItem, Order, OrderItem, Product
+
+
+def _hold_expiry():
+    return timezone.now() + timedelta(seconds=settings.CART_HOLD_SECONDS)
+
+
+def _per_product(quantities):
+    """
+    Build a CASE expression mapping product ids to quantities so a batch of
+    products is adjusted with one UPDATE.
+    """
+    return Case(
+        *[When(pk=pk, then=Value(quantity)) for pk, quantity in quantities.items()],
+        default=Value(0),
+        output_field=PositiveIntegerField(),
+    )
+
+
+def add_to_cart(user, product, quantity):
+    # Locks are always taken cart item first, then product, as in checkout()
+    # and release_expired_holds().
+    with transaction.atomic():
+        cart, _ = Cart.objects.get_or_create(user=user)
+        item, created = CartItem.objects.select_for_update().get_or_create(
+            cart=cart, product=product,
+            defaults={'quantity': quantity, 'expires_at': _hold_expiry()},
+        )
+        held = Product.objects.filter(
+            pk=product.pk, inventory__gte=F('reserved') + quantity
+        ).update(reserved=F('reserved') + quantity)
+        if not held:
+            raise serializers.ValidationError(f"Not enough inventory for product {product.name}")
+
+        if not created:
+            CartItem.objects.filter(pk=item.pk).update(
+                quantity=F('quantity') + quantity, expires_at=_hold_expiry())
+        cart.save(update_fields=['updated_at'])
+    return cart
+
+
+def remove_from_cart(user, item_id):
+    try:
+        items = CartItem.objects.select_for_update().filter(pk=item_id, cart__user=user)
+    except (DjangoValidationError, ValueError):
+        # Not a UUID, so not one of this user's items.
+        return False
+    with transaction.atomic():
+        item = items.first()
+        if item is None:
+            return False
+        Product.objects.filter(pk=item.product_id).update(reserved=F('reserved') - item.quantity)
+        item.delete()
+    return True
+
+
+def checkout(user):
+    """
+    Turn the user's held cart items into an Order in one transaction, at
+    current product prices. Expired holds are not honoured, even before the
+    sweeper has released them.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        items = list(
+            CartItem.objects.select_for_update()
+            .filter(cart__user=user)
+            .select_related('product')
+        )
+        if not items:
+            raise serializers.ValidationError("Cart is empty")
+        expired = [item.product.name for item in items if item.expires_at <= now]
+        if expired:
+            raise serializers.ValidationError(
+                f"Cart hold expired for {', '.join(expired)}; add the items again")
+
+        total = sum((item.product.price * item.quantity for item in items), Decimal('0.00'))
+        order = Order.objects.create(user=user, total_amount=total)
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=item.product, product_name=item.product.name,
+                      quantity=item.quantity, price=item.product.price)
+            for item in items
+        ])
+
+        # Held units are sold: drop them from both inventory and reserved.
+        # Each product must still cover its quantity, or nothing is sold.
+        quantities = Counter()
+        for item in items:
+            quantities[item.product_id] += item.quantity
+        covered = Q()
+        for pk, quantity in quantities.items():
+            covered |= Q(pk=pk, inventory__gte=quantity, reserved__gte=quantity)
+        sold = Product.objects.filter(covered).update(
+            inventory=F('inventory') - _per_product(quantities),
+            reserved=F('reserved') - _per_product(quantities),
+            updated_at=now,
+        )
+        if sold != len(quantities):
+            raise serializers.ValidationError("Not enough inventory to complete checkout")
+        record_changes(Product, quantities)
+        CartItem.objects.filter(pk__in=[item.pk for item in items]).delete()
+        enqueue(tasks.send_order_confirmation, str(order.pk))
+    return order
+
+
+def release_expired_holds(batch_size=500, now=None):
+    """
+    Release expired holds in batches, walking the expires_at index. Returns
+    the number of cart items released.
+    """
+    now = now or timezone.now()
+    released = 0
+    while True:
+        with transaction.atomic():
+            batch = list(
+                CartItem.objects.select_for_update(skip_locked=True)
+                .filter(expires_at__lte=now)
+                .order_by('expires_at')
+                .values_list('pk', 'product_id', 'quantity')[:batch_size]
+            )
+            if not batch:
+                return released
+            quantities = Counter()
+            for _, product_id, quantity in batch:
+                quantities[product_id] += quantity
+            Product.objects.filter(pk__in=quantities).update(reserved=F('reserved') - _per_product(quantities))
+            CartItem.objects.filter(pk__in=[pk for pk, _, _ in batch]).delete()
+        released += len(batch)
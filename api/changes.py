@@ -0,0 +1,196 @@
+"""
+Incremental change feed for artisans, products and orders.
+
+Every create, update and delete writes a ChangeEvent in the same
+transaction as the change (a transactional outbox), so downstream systems
+can ask for everything after a cursor instead of re-reading the catalogue.
+Model saves and deletes, including cascades, are caught by signals;
+queryset `update()`/`bulk_update()` calls do not send signals and must
+call `record_changes()` themselves. Cart holds, which only touch
+Product.reserved, are deliberately left out, so product data in the feed
+omits `available`, which holds change without an event.
+
+Event ids are allocated at insert, not at commit, so a transaction that
+commits late can expose a lower id than one already served. The cursor is
+therefore `sequence`, which `sequence_changes()` assigns to committed
+events only, one numbering transaction at a time: a number is only chosen
+once every lower number has committed, so the feed never has a gap that
+fills in later.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Exists, Max, OuterRef, Prefetch, Value, When
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Artisan, ChangeEvent, Order, Product
+
+TRACKED_MODELS = {
+    'artisan': Artisan,
+    'product': Product,
+    'order': Order,
+}
+_names = {model: name for name, model in TRACKED_MODELS.items()}
+_delete_action = ContextVar('delete_action', default=ChangeEvent.DELETED)
+# Fields that change without an event, left out of the feed's data.
+_UNTRACKED_FIELDS = {'product': ('available',)}
+
+
+def record_changes(model, ids, action=ChangeEvent.UPDATED):
+    """
+    Record a change for each primary key in `ids`. Call this inside the
+    transaction that made the change.
+    """
+    now = timezone.now()
+    ChangeEvent.objects.bulk_create([
+        ChangeEvent(model=_names[model], object_id=pk, action=action, created_at=now)
+        for pk in dict.fromkeys(ids)
+    ])
+
+
+@receiver(post_save, sender=Artisan)
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Order)
+def _record_save(sender, instance, created, **kwargs):
+    record_changes(sender, [instance.pk], ChangeEvent.CREATED if created else ChangeEvent.UPDATED)
+
+
+@receiver(post_delete, sender=Artisan)
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Order)
+def _record_delete(sender, instance, **kwargs):
+    record_changes(sender, [instance.pk], _delete_action.get())
+
+
+@contextmanager
+def deletes_recorded_as(action):
+    """
+    Record deletes inside the block as `action`, e.g. ARCHIVED for orders
+    moved to the archive rather than removed.
+    """
+    token = _delete_action.set(action)
+    try:
+        yield
+    finally:
+        _delete_action.reset(token)
+
+
+def _current_state(name, ids, context):
+    """
+    Serialize the live rows for `ids`, keyed by primary key. Deleted rows
+    are simply missing.
+    """
+    from .serializers import ArtisanSerializer, OrderSerializer, ProductSerializer
+
+    if name == 'artisan':
+        queryset = Artisan.objects.prefetch_related(
+            Prefetch('products', queryset=Product.objects.only('id', 'artisan_id')))
+        serializer_class = ArtisanSerializer
+    elif name == 'product':
+        queryset = Product.objects.select_related('artisan')
+        serializer_class = ProductSerializer
+    else:
+        queryset = Order.objects.select_related('user').prefetch_related('items')
+        serializer_class = OrderSerializer
+    untracked = _UNTRACKED_FIELDS.get(name, ())
+    states = {}
+    for row in queryset.filter(pk__in=ids):
+        data = states[row.pk] = serializer_class(row, context=context).data
+        for field in untracked:
+            del data[field]
+    return states
+
+
+def sequence_changes(batch_size=1000):
+    """
+    Number committed events that have no sequence yet, in id order, after
+    the highest number so far. Returns how many were numbered.
+    """
+    numbered = 0
+    while True:
+        try:
+            with transaction.atomic():
+                ids = list(ChangeEvent.objects.select_for_update().filter(sequence__isnull=True)
+                           .order_by('id').values_list('id', flat=True)[:batch_size])
+                if not ids:
+                    return numbered
+                last = ChangeEvent.objects.aggregate(last=Max('sequence'))['last'] or 0
+                ChangeEvent.objects.filter(id__in=ids).update(sequence=Case(
+                    *[When(id=pk, then=Value(last + offset)) for offset, pk in enumerate(ids, 1)]))
+        except IntegrityError:
+            # A concurrent numberer took these numbers first; whatever it
+            # left over is picked up by the next call.
+            return numbered
+        numbered += len(ids)
+
+
+def read_changes(since=0, limit=None, context=None):
+    """
+    Return up to `limit` events after cursor `since`, in commit order, each
+    with the current state of its object (None once deleted or archived).
+    """
+    limit = limit or settings.CHANGE_FEED_PAGE_SIZE
+    sequence_changes()
+    events = list(ChangeEvent.objects.filter(sequence__gt=since).order_by('sequence')[:limit + 1])
+    has_more = len(events) > limit
+    events = events[:limit]
+
+    state = {}
+    for name in TRACKED_MODELS:
+        ids = {event.object_id for event in events
+               if event.model == name and event.action in (ChangeEvent.CREATED, ChangeEvent.UPDATED)}
+        if ids:
+            state[name] = _current_state(name, ids, context or {})
+
+    results = [{
+        'cursor': event.sequence,
+        'model': event.model,
+        'id': event.object_id,
+        'action': event.action,
+        'changed_at': event.created_at,
+        'data': state.get(event.model, {}).get(event.object_id),
+    } for event in events]
+    cursor = events[-1].sequence if events else since
+    return results, cursor, has_more
+
+
+def compact_changes(batch_size=1000):
+    """
+    Drop events superseded by a later numbered event for the same object,
+    and delete or archive tombstones older than CHANGE_FEED_TOMBSTONE_DAYS. Only events older
+    than CHANGE_FEED_COMPACT_AFTER_SECONDS are touched, so consumers that
+    are nearly caught up still see every step. Events are compared by
+    sequence, not id, since ids are assigned before commit; committed
+    events are numbered first, and any still unnumbered are left alone. The highest numbered event is always
+    kept so numbering never restarts below a cursor already handed out.
+    Returns the number deleted.
+    """
+    # Number what has committed first, so it can be compared.
+    sequence_changes()
+    now = timezone.now()
+    newest = ChangeEvent.objects.aggregate(newest=Max('sequence'))['newest']
+    horizon = now - timedelta(seconds=settings.CHANGE_FEED_COMPACT_AFTER_SECONDS)
+    numbered = ChangeEvent.objects.filter(sequence__isnull=False)
+    superseded = numbered.filter(created_at__lt=horizon).filter(Exists(
+        ChangeEvent.objects.filter(model=OuterRef('model'), object_id=OuterRef('object_id'),
+                                   sequence__gt=OuterRef('sequence'))
+    ))
+    expired = numbered.filter(
+        action__in=[ChangeEvent.DELETED, ChangeEvent.ARCHIVED],
+        created_at__lt=now - timedelta(days=settings.CHANGE_FEED_TOMBSTONE_DAYS),
+    )
+    if newest is not None:
+        superseded, expired = superseded.exclude(sequence=newest), expired.exclude(sequence=newest)
+    deleted = 0
+    for queryset in (superseded, expired):
+        while True:
+            ids = list(queryset.values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            deleted += ChangeEvent.objects.filter(id__in=ids).delete()[0]
+    return deleted
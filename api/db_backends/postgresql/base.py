@@ -0,0 +1,135 @@
+"""
+PostgreSQL backend with an instrumented psycopg connection pool.
+
+Select it with ENGINE='api.db_backends.postgresql' and OPTIONS['pool'] (see
+core/settings.py). Pooled connections are only pinged on checkout when they
+have been idle for longer than the pool's `check_idle` seconds, instead of
+on every request.
+"""
+import threading
+import time
+import weakref
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.base.base import NO_DB_ALIAS
+from django.db.backends.postgresql.base import DatabaseWrapper as PostgresDatabaseWrapper
+
+
+class IdleHealthCheck:
+    """
+    Pool `check` callback that skips the round trip for recently used connections.
+    """
+
+    def __init__(self, idle_seconds, ping):
+        self.idle_seconds = idle_seconds
+        self.ping = ping
+        self.checks = 0
+        self._returned_at = weakref.WeakKeyDictionary()
+
+    def returned(self, connection):
+        self._returned_at[connection] = time.monotonic()
+
+    def __call__(self, connection):
+        returned_at = self._returned_at.get(connection)
+        if returned_at is not None and time.monotonic() - returned_at < self.idle_seconds:
+            return
+        self.checks += 1
+        self.ping(connection)
+
+
+class CheckoutStats:
+    """
+    Thread-safe counters for time spent getting a connection from the pool.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def record(self, seconds):
+        with self._lock:
+            self.checkouts += 1
+            self.total_seconds += seconds
+            self.max_seconds = max(self.max_seconds, seconds)
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                'checkouts': self.checkouts,
+                'checkout_ms_total': round(self.total_seconds * 1000, 3),
+                'checkout_ms_avg': round(self.total_seconds * 1000 / self.checkouts, 3) if self.checkouts else 0.0,
+                'checkout_ms_max': round(self.max_seconds * 1000, 3),
+            }
+
+
+class DatabaseWrapper(PostgresDatabaseWrapper):
+    _health_checks = {}
+    _checkout_stats = {}
+    # Guards creating a pool together with its health check and stats, so
+    # threads racing on first use cannot register a losing pool's counters.
+    _pool_lock = threading.Lock()
+
+    @property
+    def pool(self):
+        pool_options = self.settings_dict['OPTIONS'].get('pool')
+        if pool_options and self.alias != NO_DB_ALIAS and self.alias not in self._connection_pools:
+            with self._pool_lock:
+                if self.alias not in self._connection_pools:
+                    # Django reuses a pool already registered for this alias,
+                    # which lets us supply our own `check` callback.
+                    self._connection_pools[self.alias] = self._create_pool(pool_options)
+        return super().pool
+
+    def _create_pool(self, pool_options):
+        if self.settings_dict.get('CONN_MAX_AGE', 0) != 0:
+            raise ImproperlyConfigured("Pooling doesn't support persistent connections.")
+        try:
+            from psycopg_pool import ConnectionPool
+        except ImportError as err:
+            raise ImproperlyConfigured(
+                'Error loading psycopg_pool module.\nDid you install psycopg[pool]?'
+            ) from err
+
+        pool_options = {} if pool_options is True else dict(pool_options)
+        check_idle = pool_options.pop('check_idle', 30)
+        health_check = IdleHealthCheck(check_idle, ConnectionPool.check_connection)
+        self._health_checks[self.alias] = health_check
+        self._checkout_stats[self.alias] = CheckoutStats()
+
+        connect_kwargs = self.get_connection_params()
+        connect_kwargs['autocommit'] = True
+        return ConnectionPool(
+            kwargs=connect_kwargs,
+            open=False,
+            configure=self._configure_connection,
+            check=health_check,
+            name=self.alias,
+            **pool_options,
+        )
+
+    def get_new_connection(self, conn_params):
+        if not self.pool:
+            return super().get_new_connection(conn_params)
+        start = time.perf_counter()
+        connection = super().get_new_connection(conn_params)
+        self._checkout_stats[self.alias].record(time.perf_counter() - start)
+        return connection
+
+    def _close(self):
+        if self.connection is not None and self.pool:
+            self._health_checks[self.alias].returned(self.connection)
+        return super()._close()
+
+    def pool_stats(self):
+        """
+        Pool counters (psycopg's requests_num, requests_queued, requests_wait_ms,
+        ...) merged with checkout latency and health-check counts.
+        """
+        if self.alias not in self._connection_pools:
+            return {}
+        stats = dict(self._connection_pools[self.alias].get_stats())
+        stats.update(self._checkout_stats[self.alias].as_dict())
+        stats['health_checks'] = self._health_checks[self.alias].checks
+        return stats
@@ -0,0 +1,145 @@
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from rest_framework.permissions import SAFE_METHODS
+
+
+_replica_reads = ContextVar('replica_reads', default=False)
+
+# Treat a Postgres standby with nothing left to replay as fully caught up;
+# pg_last_xact_replay_timestamp() alone keeps growing on an idle primary.
+POSTGRES_LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+
+def replica_reads_enabled():
+    return _replica_reads.get()
+
+
+@contextmanager
+def replica_reads():
+    """
+    Route reads issued inside the block to a healthy replica.
+    """
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def _pin_key(user_id):
+    return f'db:pin:{user_id}'
+
+
+def pin_to_primary(user):
+    """
+    Keep the user's reads on the primary for REPLICA_PIN_SECONDS after a write.
+    """
+    cache.set(_pin_key(user.pk), True, settings.REPLICA_PIN_SECONDS)
+
+
+def is_pinned_to_primary(user):
+    return bool(user.is_authenticated and cache.get(_pin_key(user.pk)))
+
+
+class ReplicaHealth:
+    """
+    Per-process cache of replica availability and replication lag.
+    """
+
+    def __init__(self):
+        self._checked = {}
+
+    def is_healthy(self, alias):
+        checked_at, healthy = self._checked.get(alias, (None, False))
+        now = time.monotonic()
+        if checked_at is None or now - checked_at >= settings.REPLICA_HEALTH_CHECK_INTERVAL:
+            healthy = self.check(alias)
+            self._checked[alias] = (now, healthy)
+        return healthy
+
+    def check(self, alias):
+        connection = connections[alias]
+        try:
+            with connection.cursor() as cursor:
+                if connection.vendor == 'postgresql':
+                    cursor.execute(POSTGRES_LAG_SQL)
+                    lag = float(cursor.fetchone()[0])
+                    return lag <= settings.REPLICA_MAX_LAG_SECONDS
+                cursor.execute('SELECT 1')
+                return True
+        except DatabaseError:
+            return False
+
+    def reset(self):
+        self._checked.clear()
+
+
+replica_health = ReplicaHealth()
+
+
+class PrimaryReplicaRouter:
+    """
+    Send reads to a replica only inside `replica_reads()`; everything else,
+    and every write, stays on the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not replica_reads_enabled():
+            return DEFAULT_DB_ALIAS
+        replicas = [alias for alias in settings.DATABASE_REPLICAS if replica_health.is_healthy(alias)]
+        if not replicas:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        # Be explicit: Django would otherwise write an instance back to the
+        # database it was read from, which may be a replica.
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        pool = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in pool and obj2._state.db in pool:
+            return True
+        return None
+
+
+class ReplicaRoutingMixin:
+    """
+    ViewSet mixin that serves safe requests from a replica unless the user
+    wrote recently, and pins the user to the primary after a successful write.
+    """
+    read_from_replica = True
+
+    def dispatch(self, request, *args, **kwargs):
+        # Restore the routing flag however the request ends, including on
+        # exceptions that bypass finalize_response().
+        token = _replica_reads.set(False)
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            _replica_reads.reset(token)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if (self.read_from_replica and request.method in SAFE_METHODS
+                and not is_pinned_to_primary(request.user)):
+            _replica_reads.set(True)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        _replica_reads.set(False)
+        if (request.method not in SAFE_METHODS and response.status_code < 400
+                and request.user.is_authenticated):
+            pin_to_primary(request.user)
+        return super().finalize_response(request, response, *args, **kwargs)
@@ -0,0 +1,139 @@
+import hashlib
+from decimal import Decimal
+
+import django_filters
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Q
+from django.utils.http import urlencode
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+from .geo import within_radius
+from .models import Product
+
+# Query parameters that change the page, not the result set.
+NON_FILTER_PARAMS = {'page', 'page_size', 'ordering', 'facets'}
+FACET_LIMIT = 50
+
+
+class ProductFilter(django_filters.FilterSet):
+    in_stock = django_filters.BooleanFilter(method='filter_in_stock')
+    location = django_filters.CharFilter(field_name='artisan__location', lookup_expr='iexact')
+
+    class Meta:
+        model = Product
+        fields = {
+            'artisan': ['exact'],
+            'price': ['exact', 'gte', 'lte'],
+            'inventory': ['gte', 'lte'],
+            'created_at': ['gte', 'lte'],
+        }
+
+    def filter_in_stock(self, queryset, name, value):
+        # Units held in carts are not in stock for other shoppers.
+        in_stock = Q(inventory__gt=F('reserved'))
+        return queryset.filter(in_stock) if value else queryset.exclude(in_stock)
+
+
+def price_buckets():
+    """
+    Return (label, low, high) tuples from PRODUCT_PRICE_BUCKETS; the last
+    bucket has no upper bound.
+    """
+    bounds = [Decimal('0')] + [Decimal(str(bound)) for bound in settings.PRODUCT_PRICE_BUCKETS]
+    buckets = []
+    for index, low in enumerate(bounds):
+        high = bounds[index + 1] if index + 1 < len(bounds) else None
+        label = f'{low}-{high}' if high is not None else f'{low}+'
+        buckets.append((label, low, high))
+    return buckets
+
+
+def compute_product_facets(queryset):
+    """
+    Count products per price bucket, artisan and artisan location with one
+    grouped query using conditional aggregation.
+    """
+    buckets = price_buckets()
+    bucket_counts = {}
+    for index, (_, low, high) in enumerate(buckets):
+        in_bucket = Q(price__gte=low) if high is None else Q(price__gte=low, price__lt=high)
+        bucket_counts[f'price_{index}'] = Count('pk', filter=in_bucket)
+
+    rows = (
+        queryset.order_by()
+        .values('artisan', 'artisan__business_name', 'artisan__location')
+        .annotate(count=Count('pk'), **bucket_counts)
+    )
+
+    prices = [0] * len(buckets)
+    artisans = []
+    locations = {}
+    for row in rows:
+        for index in range(len(buckets)):
+            prices[index] += row[f'price_{index}']
+        artisans.append({
+            'id': row['artisan'],
+            'name': row['artisan__business_name'],
+            'count': row['count'],
+        })
+        location = row['artisan__location']
+        locations[location] = locations.get(location, 0) + row['count']
+
+    artisans.sort(key=lambda facet: (-facet['count'], facet['name']))
+    return {
+        'price': [
+            {'label': label, 'min': str(low), 'max': str(high) if high is not None else None, 'count': count}
+            for (label, low, high), count in zip(buckets, prices)
+        ],
+        'artisan': artisans[:FACET_LIMIT],
+        'location': [
+            {'location': location, 'count': count}
+            for location, count in sorted(locations.items(), key=lambda item: (-item[1], item[0]))
+        ][:FACET_LIMIT],
+    }
+
+
+def product_facets(request, queryset):
+    """
+    Facets for the filtered queryset, cached per distinct set of filters.
+    """
+    params = sorted(
+        (key, value) for key, values in request.query_params.lists()
+        if key not in NON_FILTER_PARAMS for value in values
+    )
+    cache_key = 'facets:products:' + hashlib.sha1(urlencode(params).encode()).hexdigest()
+    facets = cache.get(cache_key)
+    if facets is None:
+        facets = compute_product_facets(queryset)
+        cache.set(cache_key, facets, settings.PRODUCT_FACETS_CACHE_SECONDS)
+    return facets
+
+
+class NearFilterBackend(BaseFilterBackend):
+    """
+    `?near=lat,lng&radius=km` keeps rows within `radius` km of the point,
+    nearest first. Views whose coordinates live on a related artisan set
+    `near_field_prefix`, e.g. 'artisan__'.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        near = request.query_params.get('near')
+        if not near:
+            return queryset
+        try:
+            latitude, longitude = (float(part) for part in near.split(','))
+        except ValueError:
+            raise ValidationError({'near': 'Expected "latitude,longitude".'})
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            raise ValidationError({'near': 'Coordinates are out of range.'})
+        try:
+            radius = float(request.query_params.get('radius', settings.NEAR_DEFAULT_RADIUS_KM))
+        except ValueError:
+            raise ValidationError({'radius': 'Expected a number of kilometres.'})
+        if not 0 < radius <= settings.NEAR_MAX_RADIUS_KM:
+            raise ValidationError({'radius': f'Must be between 0 and {settings.NEAR_MAX_RADIUS_KM} km.'})
+
+        prefix = getattr(view, 'near_field_prefix', '')
+        return within_radius(queryset, latitude, longitude, radius, prefix)
@@ -0,0 +1,148 @@
+"""
+Geohash helpers for "near me" queries without PostGIS.
+
+Artisans store a geohash of their coordinates in an indexed column. A
+radius query is pruned to the few geohash prefixes covering its bounding
+box (an index range scan on any database), then narrowed to the exact
+great-circle distance.
+"""
+import math
+
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.functions import ASin, Cos, Power, Radians, Sin, Sqrt
+
+EARTH_RADIUS_KM = 6371.0088
+GEOHASH_PRECISION = 9
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def geohash_encode(latitude, longitude, precision=GEOHASH_PRECISION):
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        if even:
+            mid = (lng_range[0] + lng_range[1]) / 2
+            if longitude >= mid:
+                value = (value << 1) | 1
+                lng_range[0] = mid
+            else:
+                value <<= 1
+                lng_range[1] = mid
+        else:
+            mid = (lat_range[0] + lat_range[1]) / 2
+            if latitude >= mid:
+                value = (value << 1) | 1
+                lat_range[0] = mid
+            else:
+                value <<= 1
+                lat_range[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits = 0
+            value = 0
+    return ''.join(chars)
+
+
+def cell_size(precision):
+    """
+    Return the (height, width) in degrees of a geohash cell.
+    """
+    lat_bits = 5 * precision // 2
+    lng_bits = 5 * precision - lat_bits
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lng_bits
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """
+    Return (min_lat, max_lat, min_lng, max_lng) enclosing the circle. Boxes
+    that touch a pole or cross the antimeridian span all longitudes.
+    """
+    delta_lat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    min_lat = max(latitude - delta_lat, -90.0)
+    max_lat = min(latitude + delta_lat, 90.0)
+    if min_lat == -90.0 or max_lat == 90.0:
+        return min_lat, max_lat, -180.0, 180.0
+    delta_lng = math.degrees(radius_km / (EARTH_RADIUS_KM * math.cos(math.radians(latitude))))
+    min_lng = longitude - delta_lng
+    max_lng = longitude + delta_lng
+    if min_lng < -180.0 or max_lng > 180.0:
+        return min_lat, max_lat, -180.0, 180.0
+    return min_lat, max_lat, min_lng, max_lng
+
+
+def _steps(start, stop, step):
+    value = start
+    while value < stop:
+        yield value
+        value += step
+    yield stop
+
+
+def covering_cells(box, max_cells=16):
+    """
+    Return the geohash prefixes, at the finest precision that needs no more
+    than `max_cells` of them, covering the box. An empty set means the box
+    is too large for prefixes to help.
+    """
+    min_lat, max_lat, min_lng, max_lng = box
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        height, width = cell_size(precision)
+        rows = math.floor((max_lat + 90) / height) - math.floor((min_lat + 90) / height) + 1
+        columns = math.floor((max_lng + 180) / width) - math.floor((min_lng + 180) / width) + 1
+        if rows * columns > max_cells:
+            continue
+        # Stepping by one cell size never skips a cell.
+        return {
+            geohash_encode(lat, lng, precision)
+            for lat in _steps(min_lat, max_lat, height)
+            for lng in _steps(min_lng, max_lng, width)
+        }
+    return set()
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def distance_expression(latitude, longitude, prefix=''):
+    """
+    Great-circle distance in km from a point to `<prefix>latitude/longitude`.
+    """
+    lat1 = Radians(Value(latitude, output_field=FloatField()))
+    lng1 = Radians(Value(longitude, output_field=FloatField()))
+    lat2 = Radians(F(f'{prefix}latitude'))
+    lng2 = Radians(F(f'{prefix}longitude'))
+    a = (
+        Power(Sin((lat2 - lat1) / 2), 2)
+        + Cos(lat1) * Cos(lat2) * Power(Sin((lng2 - lng1) / 2), 2)
+    )
+    return 2 * EARTH_RADIUS_KM * ASin(Sqrt(a))
+
+
+def within_radius(queryset, latitude, longitude, radius_km, prefix=''):
+    """
+    Filter to rows within `radius_km`, annotated with `distance` and ordered
+    nearest first. `prefix` points at the artisan, e.g. 'artisan__'.
+    """
+    min_lat, max_lat, min_lng, max_lng = box = bounding_box(latitude, longitude, radius_km)
+    candidates = Q(**{
+        f'{prefix}latitude__range': (min_lat, max_lat),
+        f'{prefix}longitude__range': (min_lng, max_lng),
+    })
+    cells = Q()
+    for cell in sorted(covering_cells(box)):
+        cells |= Q(**{f'{prefix}geocell__startswith': cell})
+    return (
+        queryset.filter(cells, candidates)
+        .annotate(distance=distance_expression(latitude, longitude, prefix))
+        .filter(distance__lte=radius_km)
+        .order_by('distance')
+    )
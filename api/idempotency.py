@@ -0,0 +1,149 @@
+import functools
+import hashlib
+import json
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = 'HTTP_IDEMPOTENCY_KEY'
+
+
+class IdempotencyKeyInUse(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'A request with this Idempotency-Key is still being processed.'
+    default_code = 'idempotency_key_in_use'
+
+    def __init__(self, detail=None, code=None, wait=None):
+        super().__init__(detail, code)
+        self.wait = wait
+
+
+class IdempotencyKeyReused(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = 'This Idempotency-Key was already used with a different request.'
+    default_code = 'idempotency_key_reused'
+
+
+def request_fingerprint(request):
+    body = json.dumps(request.data, sort_keys=True, cls=DjangoJSONEncoder)
+    return hashlib.sha256(f'{request.method} {request.path}\n{body}'.encode()).hexdigest()
+
+
+def _lease():
+    return timezone.now() + timedelta(seconds=settings.IDEMPOTENCY_LEASE_SECONDS)
+
+
+def _claim(user, key, fingerprint):
+    """
+    Insert the key, or return the existing record if another request owns it.
+    """
+    try:
+        with transaction.atomic():
+            record = IdempotencyKey.objects.create(
+                user=user,
+                key=key,
+                fingerprint=fingerprint,
+                locked_until=_lease(),
+                expires_at=timezone.now() + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL),
+            )
+            return record, True
+    except IntegrityError:
+        return IdempotencyKey.objects.filter(user=user, key=key).first(), False
+
+
+def _take_over(record):
+    """
+    Take over an unfinished record whose lease has run out. Returns False
+    if its owner is still within the lease or another retry got there first.
+    """
+    if record.locked_until is not None and record.locked_until > timezone.now():
+        return False
+    lease = _lease()
+    taken = IdempotencyKey.objects.filter(
+        pk=record.pk, response_status__isnull=True, locked_until=record.locked_until,
+    ).update(locked_until=lease)
+    record.locked_until = lease
+    return bool(taken)
+
+
+def idempotent(view_method):
+    """
+    Make a view method safe to retry with an Idempotency-Key header.
+
+    The first request with a key runs the view and stores its response;
+    repeats get the stored response back without running the view again.
+    Repeats that arrive while the first is running wait up to
+    IDEMPOTENCY_WAIT_TIMEOUT for its response, then get 409. If its lease
+    runs out they take the key over and run the view instead. Server
+    errors and exceptions release the key so the client can retry.
+    """
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.META.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return view_method(self, request, *args, **kwargs)
+        if len(key) > 255:
+            raise ValidationError({'Idempotency-Key': 'Must be at most 255 characters.'})
+
+        fingerprint = request_fingerprint(request)
+        deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_TIMEOUT
+        while True:
+            record, created = _claim(request.user, key, fingerprint)
+            if created:
+                break
+            if record is None:
+                # The owner gave up the key between our insert and lookup.
+                continue
+            if record.expires_at <= timezone.now():
+                record.delete()
+                continue
+            if record.fingerprint != fingerprint:
+                raise IdempotencyKeyReused()
+            if record.response_status is not None:
+                return Response(record.response_body, status=record.response_status,
+                                headers={'Idempotent-Replayed': 'true'})
+            if _take_over(record):
+                break
+            if time.monotonic() >= deadline:
+                raise IdempotencyKeyInUse(wait=1)
+            time.sleep(settings.IDEMPOTENCY_POLL_INTERVAL)
+
+        # Writes are fenced on the lease, so a request that lost the key to
+        # a retry cannot overwrite or release it.
+        owned = IdempotencyKey.objects.filter(pk=record.pk, locked_until=record.locked_until)
+        try:
+            response = view_method(self, request, *args, **kwargs)
+        except BaseException:
+            owned.delete()
+            raise
+
+        if response.status_code >= 500:
+            owned.delete()
+        else:
+            owned.update(response_status=response.status_code, response_body=response.data,
+                         locked_until=None)
+        return response
+
+    return wrapper
+
+
+def purge_expired_keys(batch_size=1000):
+    """
+    Delete expired keys in batches, returning how many were removed.
+    """
+    deleted = 0
+    while True:
+        ids = list(IdempotencyKey.objects.filter(expires_at__lte=timezone.now())
+                   .values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += IdempotencyKey.objects.filter(id__in=ids).delete()[0]
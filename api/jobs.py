@@ -0,0 +1,165 @@
+"""
+A small database-backed job queue.
+
+Tasks are plain functions registered with `@task`. `enqueue()` inserts a
+Job row once the surrounding transaction commits, so work is never queued
+for data that was rolled back. `manage.py run_worker` claims due jobs with
+a conditional UPDATE (portable across databases, no broker needed), runs
+them, and retries failures with exponential backoff.
+"""
+import logging
+import os
+import random
+import socket
+import traceback
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+_tasks = {}
+_periodic = {}
+
+
+def task(name=None, max_attempts=5, every=None):
+    """
+    Register a function as a task. `every` (a timedelta) makes the worker
+    schedule it periodically.
+    """
+    def decorator(func):
+        task_name = name or f'{func.__module__}.{func.__name__}'
+        func.task_name = task_name
+        func.max_attempts = max_attempts
+        _tasks[task_name] = func
+        if every is not None:
+            _periodic[task_name] = every
+        return func
+    return decorator
+
+
+def get_task(name):
+    return _tasks.get(name)
+
+
+def enqueue(func, *args, run_at=None, **kwargs):
+    """
+    Queue `func(*args, **kwargs)` to run in a worker once the current
+    transaction commits (immediately outside a transaction).
+    """
+    if getattr(func, 'task_name', None) not in _tasks:
+        raise ValueError(f'{func!r} is not a registered task')
+    job = Job(name=func.task_name, args=list(args), kwargs=kwargs,
+              max_attempts=func.max_attempts, run_at=run_at or timezone.now())
+    transaction.on_commit(partial(job.save, force_insert=True))
+    return job
+
+
+def worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def retry_delay(attempts):
+    """
+    Exponential backoff with jitter: base * 2**(attempts - 1), capped.
+    """
+    delay = min(settings.JOB_RETRY_BASE_SECONDS * 2 ** (attempts - 1), settings.JOB_RETRY_MAX_SECONDS)
+    return timedelta(seconds=delay * random.uniform(0.5, 1.0))
+
+
+def claim_job(worker=None):
+    """
+    Atomically move one due job from queued to running and return it.
+    """
+    now = timezone.now()
+    candidates = (Job.objects.filter(status=Job.QUEUED, run_at__lte=now)
+                  .order_by('run_at').values_list('pk', flat=True)[:10])
+    for pk in candidates:
+        claimed = Job.objects.filter(pk=pk, status=Job.QUEUED).update(
+            status=Job.RUNNING, locked_at=now, locked_by=worker or worker_id(),
+            attempts=F('attempts') + 1, updated_at=now,
+        )
+        if claimed:
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def run_job(job):
+    func = get_task(job.name)
+    try:
+        if func is None:
+            raise LookupError(f'Unknown task {job.name}')
+        func(*job.args, **job.kwargs)
+    except Exception:
+        job.last_error = traceback.format_exc()
+        if func is None or job.attempts >= job.max_attempts:
+            job.status = Job.FAILED
+            logger.exception('Job %s (%s) failed permanently', job.pk, job.name)
+        else:
+            job.status = Job.QUEUED
+            job.run_at = timezone.now() + retry_delay(job.attempts)
+            logger.warning('Job %s (%s) failed, retrying at %s', job.pk, job.name, job.run_at)
+    else:
+        job.status = Job.SUCCEEDED
+        job.last_error = ''
+    job.locked_at = None
+    job.locked_by = ''
+    job.save(update_fields=['status', 'run_at', 'last_error', 'locked_at', 'locked_by', 'updated_at'])
+    return job
+
+
+def run_pending(worker=None, limit=None):
+    """
+    Run due jobs until none are left (or `limit` ran). Returns the count.
+    """
+    ran = 0
+    while limit is None or ran < limit:
+        job = claim_job(worker)
+        if job is None:
+            break
+        run_job(job)
+        close_old_connections()
+        ran += 1
+    return ran
+
+
+def requeue_stale_jobs():
+    """
+    Put back jobs whose worker died mid-run. The lost run counts as an
+    attempt (claim_job counted it), so a job that keeps killing its worker
+    fails once it reaches max_attempts. Returns the number requeued.
+    """
+    now = timezone.now()
+    cutoff = now - timedelta(seconds=settings.JOB_LOCK_TIMEOUT_SECONDS)
+    stale = Job.objects.filter(status=Job.RUNNING, locked_at__lt=cutoff)
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED, locked_at=None, locked_by='', updated_at=now,
+        last_error='Worker stopped responding while running this job.')
+    if failed:
+        logger.error('%d stale jobs failed permanently', failed)
+    return stale.update(status=Job.QUEUED, locked_at=None, locked_by='', updated_at=now)
+
+
+def schedule_periodic_jobs():
+    """
+    Queue each periodic task that has nothing pending, `every` after its last
+    run. Workers may race here; the unique_pending_periodic_job constraint
+    lets only one of them insert the job.
+    """
+    now = timezone.now()
+    for name, every in _periodic.items():
+        if Job.objects.filter(name=name, status__in=[Job.QUEUED, Job.RUNNING]).exists():
+            continue
+        last = Job.objects.filter(name=name).order_by('-updated_at').values_list('updated_at', flat=True).first()
+        try:
+            with transaction.atomic():
+                Job.objects.create(name=name, max_attempts=_tasks[name].max_attempts, periodic=True,
+                                   run_at=now if last is None else max(now, last + every))
+        except IntegrityError:
+            pass
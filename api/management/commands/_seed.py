@@ -0,0 +1,45 @@
+"""
+Synthetic marketplace data shared by the benchmark commands.
+"""
+import random
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+
+from api.models import Artisan, Product, Order, OrderItem
+
+User = get_user_model()
+
+
+def seed_marketplace(artisans=20, products=500, orders=200, items_per_order=3, seed=0):
+    """
+    Bulk-insert a deterministic dataset and return the created orders.
+    Callers are expected to run this inside a transaction they roll back.
+    """
+    rng = random.Random(seed)
+    users = User.objects.bulk_create(
+        User(email=f'bench{i}@example.com', username=f'bench{i}', name=f'Bench {i}')
+        for i in range(artisans)
+    )
+    artisan_objs = Artisan.objects.bulk_create(
+        Artisan(user=user, business_name=f'Workshop {i}',
+                description='Handmade goods', location=rng.choice(['Lagos', 'Abuja', 'Ibadan']))
+        for i, user in enumerate(users)
+    )
+    product_objs = Product.objects.bulk_create(
+        Product(artisan=rng.choice(artisan_objs), name=f'Product {i}',
+                description='A handmade item — one of a kind',
+                price=Decimal(rng.randint(100, 50000)) / 100, inventory=rng.randint(0, 100))
+        for i in range(products)
+    )
+    order_objs = Order.objects.bulk_create(
+        Order(user=rng.choice(users), status='pending', total_amount=Decimal('0'))
+        for _ in range(orders)
+    )
+    items = []
+    for order in order_objs:
+        for product in rng.sample(product_objs, items_per_order):
+            items.append(OrderItem(order=order, product=product, product_name=product.name,
+                                   quantity=rng.randint(1, 5), price=product.price))
+    OrderItem.objects.bulk_create(items)
+    return order_objs
@@ -0,0 +1,83 @@
+import copy
+import statistics
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.utils import load_backend
+
+QUERY = 'SELECT id, name, price FROM api_product ORDER BY name LIMIT 10'
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare per-request database latency for new connections, persistent '
+        'connections with health checks, and the pooled backend (PostgreSQL only).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--requests', type=int, default=200, help='Requests per thread.')
+        parser.add_argument('--pool-size', type=int, default=4)
+
+    def handle(self, *args, **options):
+        base = copy.deepcopy(connections['default'].settings_dict)
+        if base['ENGINE'] not in ('django.db.backends.postgresql', 'api.db_backends.postgresql'):
+            raise CommandError('bench_db_pool needs a PostgreSQL DATABASE_URL.')
+        base['OPTIONS'].pop('pool', None)
+
+        modes = {
+            'connect-per-request': dict(ENGINE='django.db.backends.postgresql',
+                                        CONN_MAX_AGE=0, CONN_HEALTH_CHECKS=False),
+            'persistent+checks': dict(ENGINE='django.db.backends.postgresql',
+                                      CONN_MAX_AGE=600, CONN_HEALTH_CHECKS=True),
+            'pool': dict(ENGINE='api.db_backends.postgresql', CONN_MAX_AGE=0, CONN_HEALTH_CHECKS=False,
+                         OPTIONS={**base['OPTIONS'], 'pool': {
+                             'min_size': options['pool_size'], 'max_size': options['pool_size']}}),
+        }
+        for name, overrides in modes.items():
+            settings_dict = {**base, **overrides}
+            latencies, stats = self._run(name, settings_dict, options['threads'], options['requests'])
+            latencies.sort()
+            p50 = latencies[len(latencies) // 2] * 1000
+            p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+            self.stdout.write(
+                f'{name:<20} mean {statistics.fmean(latencies) * 1000:7.3f} ms  '
+                f'p50 {p50:7.3f} ms  p99 {p99:7.3f} ms')
+            if stats:
+                self.stdout.write(f'{"":<20} {stats}')
+
+    def _run(self, name, settings_dict, threads, requests):
+        backend = load_backend(settings_dict['ENGINE'])
+        alias = f'bench-{name}'
+        latencies = []
+        lock = threading.Lock()
+
+        def worker():
+            connection = backend.DatabaseWrapper(copy.deepcopy(settings_dict), alias)
+            local = []
+            for _ in range(requests):
+                start = time.perf_counter()
+                # Mirror Django's request_started / request_finished handling.
+                connection.close_if_unusable_or_obsolete()
+                with connection.cursor() as cursor:
+                    cursor.execute(QUERY)
+                    cursor.fetchall()
+                connection.close_if_unusable_or_obsolete()
+                local.append(time.perf_counter() - start)
+            connection.close()
+            with lock:
+                latencies.extend(local)
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+
+        probe = backend.DatabaseWrapper(copy.deepcopy(settings_dict), alias)
+        stats = probe.pool_stats() if hasattr(probe, 'pool_stats') else {}
+        if probe.pool:
+            probe.close_pool()
+        return latencies, stats
@@ -0,0 +1,78 @@
+import io
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+
+from api.models import Product, Order
+from api.parsers import FastJSONParser
+from api.renderers import FastJSONRenderer, orjson
+from api.serializers import ProductSerializer, OrderSerializer
+from ._seed import seed_marketplace
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Compare JSONRenderer/JSONParser with the fast variants on product and order pages.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-size', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=200)
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stdout.write(self.style.WARNING('orjson is not installed; both paths use the stdlib.'))
+        try:
+            with transaction.atomic():
+                seed_marketplace(products=options['page_size'], orders=options['page_size'])
+                request = APIRequestFactory().get('/')
+                context = {'request': request}
+                pages = {
+                    'products': ProductSerializer(
+                        Product.objects.select_related('artisan')[:options['page_size']],
+                        many=True, context=context).data,
+                    'orders': OrderSerializer(
+                        Order.objects.select_related('user').prefetch_related('items')[:options['page_size']],
+                        many=True, context=context).data,
+                }
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        for name, data in pages.items():
+            payload = {'count': len(data), 'next': None, 'previous': None, 'results': data}
+            slow = JSONRenderer().render(payload)
+            fast = FastJSONRenderer().render(payload)
+            if slow != fast:
+                self.stderr.write(self.style.ERROR(f'{name}: rendered output differs'))
+            self._report(f'render {name}', options['repeat'],
+                         lambda: JSONRenderer().render(payload),
+                         lambda: FastJSONRenderer().render(payload))
+            self._report(f'parse {name}', options['repeat'],
+                         lambda: JSONParser().parse(_stream(slow)),
+                         lambda: FastJSONParser().parse(_stream(slow)))
+
+    def _report(self, label, repeat, baseline, candidate):
+        base = _timeit(baseline, repeat)
+        fast = _timeit(candidate, repeat)
+        self.stdout.write(
+            f'{label:<18} stdlib {base * 1e6:9.1f} us  fast {fast * 1e6:9.1f} us  x{base / fast:.2f}')
+
+
+def _stream(payload):
+    return io.BytesIO(payload)
+
+
+def _timeit(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
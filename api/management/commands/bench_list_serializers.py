@@ -0,0 +1,62 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.test import APIRequestFactory
+
+from api.models import Product, Order
+from api.serializers import ProductSerializer, OrderSerializer
+from api.values_serializers import SerializerPlan
+from ._seed import seed_marketplace
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Compare ModelSerializer list pages with the values() serializer plan, in rows per second.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-size', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+        size = options['page_size']
+        context = {'request': APIRequestFactory().get('/')}
+        cases = {
+            'products': (ProductSerializer, Product.objects.select_related('artisan').order_by('name')),
+            'orders': (OrderSerializer,
+                       Order.objects.select_related('user').prefetch_related('items').order_by('-created_at')),
+        }
+        try:
+            with transaction.atomic():
+                seed_marketplace(products=size, orders=size)
+                for name, (serializer_class, queryset) in cases.items():
+                    plan = SerializerPlan.for_serializer(serializer_class)
+
+                    def baseline():
+                        return serializer_class(queryset[:size], many=True, context=context).data
+
+                    def candidate():
+                        return plan.to_data(list(plan.queryset(queryset)[:size]), context)
+
+                    if baseline() != candidate():
+                        self.stderr.write(self.style.ERROR(f'{name}: output differs'))
+                    base = _timeit(baseline, options['repeat'])
+                    fast = _timeit(candidate, options['repeat'])
+                    self.stdout.write(
+                        f'{name:<10} serializer {size / base:9.0f} rows/s  '
+                        f'values plan {size / fast:9.0f} rows/s  x{base / fast:.2f}')
+                raise _Rollback
+        except _Rollback:
+            pass
+
+
+def _timeit(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
@@ -0,0 +1,88 @@
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from api.models import Artisan, Order, OrderItem, Product, User
+from api.uuids import uuid7
+
+from ._seed import seed_marketplace
+
+GENERATORS = {'v4': uuid.uuid4, 'v7': uuid7}
+MODELS = [User, Artisan, Product, Order, OrderItem]
+
+
+class _Rollback(Exception):
+    pass
+
+
+def primary_key_index_size(model):
+    """
+    Bytes used by the primary key index of `model`'s table, or None.
+    """
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                'SELECT pg_relation_size(indexrelid) FROM pg_index '
+                'WHERE indrelid = %s::regclass AND indisprimary', [table])
+        elif connection.vendor == 'sqlite':
+            cursor.execute(
+                "SELECT SUM(pgsize) FROM dbstat WHERE name IN ("
+                "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = %s "
+                "AND name LIKE 'sqlite_autoindex%%')", [table])
+        else:
+            return None
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+
+class Command(BaseCommand):
+    help = 'Compare insert throughput and primary key index growth for UUIDv4 and UUIDv7 keys.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=20000)
+        parser.add_argument('--items-per-order', type=int, default=3)
+        parser.add_argument('--products', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        for name, generator in GENERATORS.items():
+            seconds, rows, growth = self._run(generator, options)
+            sizes = '  '.join(
+                f'{model._meta.model_name} {size / 1024:8.0f} KiB' if size is not None else
+                f'{model._meta.model_name} n/a'
+                for model, size in growth.items()
+            )
+            self.stdout.write(f'{name}  {rows} rows in {seconds:6.2f} s ({rows / seconds:8.0f} rows/s)')
+            self.stdout.write(f'    pk index growth: {sizes}')
+
+    def _run(self, generator, options):
+        fields = [model._meta.pk for model in MODELS]
+        defaults = [field.default for field in fields]
+        for field in fields:
+            field.default = generator
+            # Field caches its default callable.
+            field.__dict__.pop('_get_default', None)
+        try:
+            with transaction.atomic():
+                before = {model: primary_key_index_size(model) for model in (Order, OrderItem)}
+                start = time.perf_counter()
+                orders = seed_marketplace(
+                    artisans=50, products=options['products'], orders=options['orders'],
+                    items_per_order=options['items_per_order'])
+                seconds = time.perf_counter() - start
+                rows = 100 + options['products'] + len(orders) * (1 + options['items_per_order'])
+                after = {model: primary_key_index_size(model) for model in (Order, OrderItem)}
+                growth = {
+                    model: after[model] - before[model] if None not in (before[model], after[model]) else None
+                    for model in before
+                }
+                raise _Rollback
+        except _Rollback:
+            pass
+        finally:
+            for field, default in zip(fields, defaults):
+                field.default = default
+                field.__dict__.pop('_get_default', None)
+        return seconds, rows, growth
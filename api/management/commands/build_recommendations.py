@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from api.recommendations import build_recommendations
+
+
+class Command(BaseCommand):
+    help = 'Fold new orders into the "frequently bought together" product lists.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help='Rebuild from all order history instead of orders since the last run.')
+
+    def handle(self, *args, **options):
+        run = build_recommendations(full=options['full'])
+        if run is None:
+            self.stdout.write(self.style.WARNING('Another build is in progress; skipped'))
+            return
+        kind = 'full' if run.full else 'incremental'
+        self.stdout.write(self.style.SUCCESS(f'Processed {run.orders} orders ({kind} build)'))
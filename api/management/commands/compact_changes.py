@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from api.changes import compact_changes
+
+
+class Command(BaseCommand):
+    help = 'Remove superseded change feed events and expired tombstones.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        deleted = compact_changes(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} change events'))
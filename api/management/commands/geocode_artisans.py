@@ -0,0 +1,98 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.changes import record_changes
+from api.models import Artisan
+
+
+def normalize(name):
+    return ' '.join(name.casefold().split())
+
+
+class Command(BaseCommand):
+    help = (
+        'Fill in artisan coordinates by matching Artisan.location against a local '
+        'gazetteer CSV with name, latitude and longitude columns.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('gazetteer', help='Path to the gazetteer CSV file.')
+        parser.add_argument('--overwrite', action='store_true',
+                            help='Also re-geocode artisans that already have coordinates.')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        gazetteer = self.load_gazetteer(options['gazetteer'])
+
+        artisans = Artisan.objects.order_by('pk').only('pk', 'location', 'latitude', 'longitude', 'geocell')
+        if not options['overwrite']:
+            artisans = artisans.filter(latitude__isnull=True)
+
+        matched = unmatched = 0
+        batch = []
+        for artisan in artisans.iterator(chunk_size=options['batch_size']):
+            point = self.lookup(gazetteer, artisan.location)
+            if point is None:
+                unmatched += 1
+                continue
+            artisan.latitude, artisan.longitude = point
+            artisan.update_geocell()
+            batch.append(artisan)
+            if len(batch) >= options['batch_size']:
+                matched += self.flush(batch)
+        matched += self.flush(batch)
+
+        self.stdout.write(self.style.SUCCESS(f'Geocoded {matched} artisans, {unmatched} locations not found'))
+
+    def load_gazetteer(self, path):
+        try:
+            with open(path, newline='', encoding='utf-8') as handle:
+                reader = csv.DictReader(handle)
+                missing = {'name', 'latitude', 'longitude'} - set(reader.fieldnames or ())
+                if missing:
+                    raise CommandError(f'Gazetteer is missing columns: {", ".join(sorted(missing))}')
+                gazetteer = {}
+                skipped = 0
+                for row in reader:
+                    point = self.parse_point(row)
+                    if point is None:
+                        skipped += 1
+                        self.stderr.write(self.style.WARNING(
+                            f'Skipping gazetteer line {reader.line_num}: bad coordinates '
+                            f'{row["latitude"]!r}, {row["longitude"]!r}'))
+                        continue
+                    gazetteer[normalize(row['name'])] = point
+        except OSError as e:
+            raise CommandError(f'Cannot read gazetteer: {e}')
+        if skipped:
+            self.stderr.write(self.style.WARNING(f'Skipped {skipped} malformed gazetteer rows'))
+        return gazetteer
+
+    def parse_point(self, row):
+        try:
+            latitude, longitude = float(row['latitude']), float(row['longitude'])
+        except (TypeError, ValueError):
+            # TypeError: a short row leaves the column as None.
+            return None
+        # Also rejects NaN, which fails every comparison.
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            return None
+        return latitude, longitude
+
+    def lookup(self, gazetteer, location):
+        # "Ikeja, Lagos" falls back to "Ikeja" when the full string is unknown.
+        key = normalize(location)
+        if key in gazetteer:
+            return gazetteer[key]
+        return gazetteer.get(normalize(location.split(',')[0]))
+
+    def flush(self, batch):
+        count = len(batch)
+        if batch:
+            with transaction.atomic():
+                Artisan.objects.bulk_update(batch, ['latitude', 'longitude', 'geocell'])
+                record_changes(Artisan, [artisan.pk for artisan in batch])
+            batch.clear()
+        return count
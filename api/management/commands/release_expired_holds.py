@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.cart import release_expired_holds
+
+
+class Command(BaseCommand):
+    help = 'Release cart inventory holds that have expired.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--interval', type=float, default=None,
+                            help='Keep running, sweeping every INTERVAL seconds.')
+
+    def handle(self, *args, **options):
+        while True:
+            released = release_expired_holds(batch_size=options['batch_size'])
+            if released or options['interval'] is None:
+                self.stdout.write(self.style.SUCCESS(f'Released {released} expired cart holds'))
+            if options['interval'] is None:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,70 @@
+import multiprocessing
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from api.jobs import requeue_stale_jobs, run_pending, schedule_periodic_jobs, worker_id
+
+
+def work(stop, poll_interval):
+    # Forked children must not share the parent's database sockets.
+    connections.close_all()
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    worker = worker_id()
+    while not stop.is_set():
+        if not run_pending(worker, limit=100):
+            close_old_connections()
+            stop.wait(poll_interval)
+    connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Run background jobs from the database queue with a pool of worker processes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=2)
+        parser.add_argument('--poll-interval', type=float, default=1.0)
+        parser.add_argument('--once', action='store_true',
+                            help='Schedule periodic jobs, run everything due in this process, then exit.')
+
+    def handle(self, *args, **options):
+        if options['once']:
+            requeue_stale_jobs()
+            schedule_periodic_jobs()
+            ran = run_pending()
+            self.stdout.write(self.style.SUCCESS(f'Ran {ran} jobs'))
+            return
+
+        context = multiprocessing.get_context('fork')
+        stop = context.Event()
+        # Setting the Event from a handler can deadlock against stop.wait()
+        # holding the same lock, so handlers only flip a flag.
+        self.stopping = False
+
+        def request_stop(*_):
+            self.stopping = True
+
+        signal.signal(signal.SIGTERM, request_stop)
+        signal.signal(signal.SIGINT, request_stop)
+
+        workers = []
+        self.stdout.write(f"Starting {options['processes']} workers")
+        while not self.stopping:
+            # The supervisor owns scheduling and restarts crashed workers.
+            requeue_stale_jobs()
+            schedule_periodic_jobs()
+            connections.close_all()
+            workers = [process for process in workers if process.is_alive()]
+            while len(workers) < options['processes']:
+                process = context.Process(target=work, args=(stop, options['poll_interval']), daemon=True)
+                process.start()
+                workers.append(process)
+            time.sleep(max(options['poll_interval'], 5))
+
+        stop.set()
+        self.stdout.write('Stopping workers')
+        for process in workers:
+            process.join()
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.3 on 2026-10-19 14:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_cart_holds'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='artisan',
+            name='geocell',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=12),
+        ),
+        migrations.AddField(
+            model_name='artisan',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='artisan',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
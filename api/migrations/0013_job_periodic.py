@@ -0,0 +1,22 @@
+# Generated by Django 5.1.3 on 2026-10-19 15:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_idempotency_key_lease'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='periodic',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddConstraint(
+            model_name='job',
+            constraint=models.UniqueConstraint(condition=models.Q(('periodic', True), ('status__in', ['queued', 'running'])), fields=('name',), name='unique_pending_periodic_job'),
+        ),
+    ]
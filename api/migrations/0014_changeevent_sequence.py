@@ -0,0 +1,25 @@
+# Generated by Django 5.1.3 on 2026-10-19 15:20
+
+from django.db import migrations, models
+
+
+def number_existing_events(apps, schema_editor):
+    # Cursors handed out so far are event ids; keep them valid.
+    ChangeEvent = apps.get_model('api', 'ChangeEvent')
+    ChangeEvent.objects.update(sequence=models.F('id'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_job_periodic'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='changeevent',
+            name='sequence',
+            field=models.BigIntegerField(blank=True, null=True, unique=True),
+        ),
+        migrations.RunPython(number_existing_events, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+from django.db import migrations, transaction
+from django.db.models import OuterRef, Subquery
+
+BATCH_SIZE = 5000
+
+
+def snapshot_product_names(apps, schema_editor):
+    # Fill in OrderItem.product_name (added in 0010) one primary key range
+    # per transaction. Only blank names are touched, so an interrupted run
+    # can simply be repeated.
+    OrderItem = apps.get_model('api', 'OrderItem')
+    Product = apps.get_model('api', 'Product')
+    db_alias = schema_editor.connection.alias
+    items = OrderItem.objects.using(db_alias).order_by('pk')
+    name = Subquery(Product.objects.using(db_alias).filter(pk=OuterRef('product_id')).values('name')[:1])
+    last = None
+    while True:
+        batch = items if last is None else items.filter(pk__gt=last)
+        bounds = list(batch.values_list('pk', flat=True)[:BATCH_SIZE])
+        if not bounds:
+            return
+        with transaction.atomic(using=db_alias):
+            items.filter(pk__gte=bounds[0], pk__lte=bounds[-1], product_name='',
+                         product__isnull=False).update(product_name=name)
+        last = bounds[-1]
+
+
+class Migration(migrations.Migration):
+    # Each batch commits on its own instead of holding every row lock
+    # until the end.
+    atomic = False
+
+    dependencies = [
+        ('api', '0014_changeevent_sequence'),
+    ]
+
+    operations = [
+        migrations.RunPython(snapshot_product_names, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.1.3 on 2026-10-19 15:22
+
+import django.db.models.expressions
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_snapshot_product_names'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='available',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.comparison.Greatest(django.db.models.expressions.CombinedExpression(models.F('inventory'), '-', models.F('reserved')), models.Value(0)), output_field=models.PositiveIntegerField()),
+        ),
+    ]
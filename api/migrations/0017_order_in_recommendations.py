@@ -0,0 +1,61 @@
+# Generated by Django 5.1.3 on 2026-10-19 15:38
+
+from django.db import migrations, models, transaction
+from django.db.models import Q
+
+BATCH_SIZE = 5000
+
+
+def mark_counted_orders(apps, schema_editor):
+    # Orders up to the last run's (created_at, id) watermark have already
+    # been counted. Mark them one primary key range per transaction, so the
+    # next incremental build does not count them again.
+    Order = apps.get_model('api', 'Order')
+    RecommendationRun = apps.get_model('api', 'RecommendationRun')
+    db_alias = schema_editor.connection.alias
+    last_run = RecommendationRun.objects.using(db_alias).order_by('-created_at').first()
+    if last_run is None or last_run.last_order_id is None:
+        return
+    counted = (Q(created_at__lt=last_run.last_order_created_at) |
+               Q(created_at=last_run.last_order_created_at, id__lte=last_run.last_order_id))
+    orders = Order.objects.using(db_alias).order_by('pk')
+    last = None
+    while True:
+        batch = orders if last is None else orders.filter(pk__gt=last)
+        bounds = list(batch.values_list('pk', flat=True)[:BATCH_SIZE])
+        if not bounds:
+            return
+        with transaction.atomic(using=db_alias):
+            orders.filter(counted, pk__gte=bounds[0], pk__lte=bounds[-1]).update(in_recommendations=True)
+        last = bounds[-1]
+
+
+class Migration(migrations.Migration):
+    # Each batch commits on its own instead of holding every row lock
+    # until the end.
+    atomic = False
+
+    dependencies = [
+        ('api', '0016_product_available'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='in_recommendations',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.RunPython(mark_counted_orders, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='recommendationrun',
+            name='last_order_created_at',
+        ),
+        migrations.RemoveField(
+            model_name='recommendationrun',
+            name='last_order_id',
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('in_recommendations', False), models.Q(('status', 'cancelled'), _negated=True)), fields=['id'], name='order_uncounted_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+import codecs
+import io
+
+from django.conf import settings
+from rest_framework.parsers import JSONParser
+
+from .renderers import FastJSONRenderer, orjson
+
+# orjson reads integers that do not fit in 64 bits as floats; the stdlib
+# keeps them exact. 19 digits already reach below the int64 minimum.
+# Mapping every digit to '0' and anything else to a space, then searching
+# for a run of zeros, is far faster than a regex.
+_DIGITS_ONLY = bytes(ord('0') if byte in b'0123456789' else ord(' ') for byte in range(256))
+_DIGIT_RUN = b'0' * 19
+
+
+class FastJSONParser(JSONParser):
+    """
+    JSONParser that decodes UTF-8 bodies with orjson when it is installed.
+
+    Bodies orjson would read differently take the stdlib path: those with
+    integers of 19 or more digits, and those orjson rejects (such as
+    `1e400`), so the stdlib parser decides what is valid. The parsed data
+    is the same either way. Other encodings use the stdlib path.
+    """
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+
+        if orjson is None or not self.strict or codecs.lookup(encoding).name != 'utf-8':
+            return super().parse(stream, media_type, parser_context)
+
+        body = stream.read()
+        if _DIGIT_RUN not in body.translate(_DIGITS_ONLY):
+            try:
+                return orjson.loads(body)
+            except ValueError:
+                pass
+        return super().parse(io.BytesIO(body), media_type, parser_context)
@@ -0,0 +1,240 @@
+"""
+"Frequently bought together" recommendations.
+
+`build_recommendations()` streams OrderItem rows grouped by order and
+counts how often each pair of products shares an order. Counts are kept
+as a sparse matrix in coordinate form: runs of two parallel `array`s of
+sorted pair keys and counts, with product ids mapped to dense integers, so
+memory is a few bytes per pair instead of a dict per product. The counts are
+added to CoPurchase, and the top RECOMMENDATION_TOP_K products for each
+touched product are rewritten into RelatedProduct, which the API reads
+with one indexed query.
+
+Each build marks the orders it counted (Order.in_recommendations), and
+incremental builds scan the orders that are not marked yet. An order that
+commits late, after a build has already passed its created_at, is still
+picked up by the next one.
+
+Each run holds a PostgreSQL advisory lock for its transaction, so a run
+that starts while another is still going (a requeued job, or the
+management command next to the worker) is skipped instead of counting
+the same orders twice. Other databases serialize the writes themselves.
+"""
+import heapq
+import uuid
+from array import array
+from itertools import groupby
+from operator import itemgetter
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .models import CoPurchase, Order, OrderItem, Product, RecommendationRun, RelatedProduct
+
+_LOW_BITS = 0xFFFFFFFF
+# Arbitrary advisory lock key shared by every recommendations run.
+_RUN_LOCK = 0x7265636F
+_MARK_BATCH_SIZE = 1000
+
+
+def _try_run_lock():
+    """
+    Take the run lock until the end of the current transaction. Returns
+    False if another run holds it.
+    """
+    if connection.vendor != 'postgresql':
+        return True
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_try_advisory_xact_lock(%s)', [_RUN_LOCK])
+        return cursor.fetchone()[0]
+
+
+def _merge(keys, counts, other_keys, other_counts):
+    """
+    Merge two sorted (keys, counts) arrays, adding counts of equal keys.
+    """
+    merged_keys, merged_counts = array('Q'), array('L')
+    i = j = 0
+    while i < len(keys) and j < len(other_keys):
+        if keys[i] < other_keys[j]:
+            merged_keys.append(keys[i])
+            merged_counts.append(counts[i])
+            i += 1
+        elif keys[i] > other_keys[j]:
+            merged_keys.append(other_keys[j])
+            merged_counts.append(other_counts[j])
+            j += 1
+        else:
+            merged_keys.append(keys[i])
+            merged_counts.append(counts[i] + other_counts[j])
+            i += 1
+            j += 1
+    merged_keys.extend(keys[i:])
+    merged_counts.extend(counts[i:])
+    merged_keys.extend(other_keys[j:])
+    merged_counts.extend(other_counts[j:])
+    return merged_keys, merged_counts
+
+
+class CoOccurrenceMatrix:
+    """
+    Symmetric product co-occurrence counts. Each pair key packs two dense
+    product indices as (row << 32) | column. New pairs are buffered and
+    sorted into a run every `buffer_size` entries. Runs are kept at least
+    twice as long as the next, merging like an LSM tree, so each pair is
+    merged O(log n) times rather than once per fold; rows() streams a heap
+    merge of the few that remain.
+    """
+
+    def __init__(self, buffer_size=1_000_000):
+        self.products = []
+        self._indices = {}
+        # Sorted (keys, counts) runs, longest first.
+        self._runs = []
+        self._buffer = array('Q')
+        self.buffer_size = buffer_size
+
+    def _index(self, product_id):
+        index = self._indices.get(product_id)
+        if index is None:
+            index = self._indices[product_id] = len(self.products)
+            self.products.append(product_id)
+        return index
+
+    def add_basket(self, product_ids):
+        indices = sorted({self._index(product_id) for product_id in product_ids})
+        for position, row in enumerate(indices):
+            for column in indices[position + 1:]:
+                self._buffer.append(row << 32 | column)
+                self._buffer.append(column << 32 | row)
+        if len(self._buffer) >= self.buffer_size:
+            self._fold()
+
+    def _fold(self):
+        if not self._buffer:
+            return
+        keys, counts = array('Q'), array('L')
+        for key, group in groupby(sorted(self._buffer)):
+            keys.append(key)
+            counts.append(sum(1 for _ in group))
+        self._buffer = array('Q')
+        while self._runs and len(self._runs[-1][0]) < 2 * len(keys):
+            keys, counts = _merge(*self._runs.pop(), keys, counts)
+        self._runs.append((keys, counts))
+
+    def rows(self):
+        """
+        Yield (product_id, [(other_id, count), ...]) for each product.
+        """
+        self._fold()
+        merged = heapq.merge(*(zip(keys, counts) for keys, counts in self._runs))
+        pairs = ((key, sum(count for _, count in group)) for key, group in groupby(merged, key=itemgetter(0)))
+        for row, entries in groupby(pairs, key=lambda pair: pair[0] >> 32):
+            yield self.products[row], [(self.products[key & _LOW_BITS], count) for key, count in entries]
+
+
+def _scan_orders(matrix, full=False):
+    """
+    Feed non-cancelled orders into `matrix`: all of them when `full` is
+    set, otherwise those not counted yet. Marks the scanned orders as
+    counted and returns how many there were.
+    """
+    items = OrderItem.objects.filter(product__isnull=False).exclude(order__status='cancelled')
+    if not full:
+        items = items.filter(order__in_recommendations=False)
+    rows = (items.order_by('order_id')
+            .values_list('order_id', 'product_id')
+            .iterator(chunk_size=2000))
+
+    # Packed 16-byte ids rather than a list of UUID objects, so a full
+    # build does not hold millions of them.
+    scanned = bytearray()
+    for order_id, basket in groupby(rows, key=itemgetter(0)):
+        product_ids = [product_id for _, product_id in basket]
+        scanned += order_id.bytes
+        # Bulk orders would add O(n^2) pairs of little signal.
+        if 1 < len(product_ids) <= settings.RECOMMENDATION_MAX_BASKET:
+            matrix.add_basket(product_ids)
+
+    # Only the orders actually read are marked: one that commits during
+    # the scan is left for the next build.
+    step = 16 * _MARK_BATCH_SIZE
+    for start in range(0, len(scanned), step):
+        chunk = scanned[start:start + step]
+        order_ids = [uuid.UUID(bytes=bytes(chunk[i:i + 16])) for i in range(0, len(chunk), 16)]
+        Order.objects.filter(pk__in=order_ids).update(in_recommendations=True)
+    return len(scanned) // 16
+
+
+def _write(matrix, full, batch_size=500):
+    """
+    Add the matrix counts to CoPurchase and rewrite RelatedProduct for
+    every product that appears in it.
+    """
+    top_k = settings.RECOMMENDATION_TOP_K
+    rows = matrix.rows()
+    while True:
+        batch = dict(row for _, row in zip(range(batch_size), rows))
+        if not batch:
+            return
+        others = {other for deltas in batch.values() for other, _ in deltas}
+        live = set(Product.objects.filter(pk__in=set(batch) | others).values_list('pk', flat=True))
+
+        existing = {} if full else {
+            (pair.product_id, pair.other_id): pair
+            for pair in CoPurchase.objects.filter(product_id__in=list(batch))
+        }
+        scores = {product_id: {} for product_id in batch}
+        for pair in existing.values():
+            scores[pair.product_id][pair.other_id] = pair.orders
+
+        created, updated = [], []
+        for product_id, deltas in batch.items():
+            if product_id not in live:
+                continue
+            for other_id, count in deltas:
+                if other_id not in live:
+                    continue
+                pair = existing.get((product_id, other_id))
+                if pair is None:
+                    pair = CoPurchase(product_id=product_id, other_id=other_id, orders=count)
+                    created.append(pair)
+                else:
+                    pair.orders += count
+                    updated.append(pair)
+                scores[product_id][other_id] = pair.orders
+        CoPurchase.objects.bulk_create(created, batch_size=1000)
+        CoPurchase.objects.bulk_update(updated, ['orders'], batch_size=1000)
+
+        RelatedProduct.objects.filter(product_id__in=list(batch)).delete()
+        related = []
+        for product_id, counts in scores.items():
+            # Highest count first; ties broken by id so results are stable.
+            best = heapq.nsmallest(top_k, counts.items(), key=lambda item: (-item[1], str(item[0])))
+            related.extend(
+                RelatedProduct(product_id=product_id, related_id=other_id, rank=rank, score=count)
+                for rank, (other_id, count) in enumerate(best, start=1)
+            )
+        RelatedProduct.objects.bulk_create(related, batch_size=1000)
+
+
+def build_recommendations(full=False):
+    """
+    Fold orders not counted by an earlier run into the recommendations, or
+    rebuild them from all order history when `full` is set (or on the
+    first run). Returns the RecommendationRun, or None if another run was
+    in progress.
+    """
+    matrix = CoOccurrenceMatrix()
+    # One transaction: readers keep the previous lists until the new ones
+    # are complete, and a failed run leaves its orders unmarked.
+    with transaction.atomic():
+        if not _try_run_lock():
+            return None
+        full = full or not RecommendationRun.objects.exists()
+        orders = _scan_orders(matrix, full)
+        if full:
+            RelatedProduct.objects.all().delete()
+            CoPurchase.objects.all().delete()
+        _write(matrix, full)
+        return RecommendationRun.objects.create(full=full, orders=orders)
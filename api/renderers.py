@@ -0,0 +1,69 @@
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional accelerator
+    orjson = None
+
+
+def _has_unportable_float(data):
+    """
+    True if `data` holds a float orjson writes differently from the stdlib:
+    NaN and Infinity (null instead of an error) or one printed with an
+    exponent ('1e16' instead of '1e+16', '1e-5' instead of '1e-05').
+    """
+    stack = [data]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, float):
+            # Also true for NaN, which fails every comparison.
+            if value and not 1e-4 <= abs(value) < 1e16:
+                return True
+        elif isinstance(value, dict):
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            stack.extend(value)
+    return False
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    Drop-in replacement for DRF's JSONRenderer.
+
+    When orjson is installed, compact responses are encoded by it natively
+    (including UUIDs), while datetimes and Decimals are handed back to DRF's
+    encoder so the output stays byte for byte identical to JSONRenderer.
+    Indented output, anything orjson refuses to encode, and floats it would
+    format differently fall back to the stdlib path. Walking the data for
+    such floats costs more than encoding it, so it only happens when the
+    output has a key starting with one of `float_fields`; add new float
+    fields there.
+    """
+    orjson_options = (orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS) if orjson else 0
+    float_fields = ('latitude', 'longitude', 'distance')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._float_markers = [f'"{name}'.encode() for name in self.float_fields]
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or not (self.compact and not self.ensure_ascii):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=self.orjson_options)
+        except TypeError:
+            # Oversized ints, non-str keys and the like: let the stdlib
+            # encoder handle (or reject) them exactly as before.
+            return super().render(data, accepted_media_type, renderer_context)
+
+        if any(marker in ret for marker in self._float_markers) and _has_unportable_float(data):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Match JSONRenderer, which escapes these to stay a strict JavaScript subset.
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
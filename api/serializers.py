@@ -1,6 +1,13 @@
+from decimal import Decimal
 from rest_framework import serializers
-from .models import Artisan, Product, Order, OrderItem
+from .models import Artisan, Product, Order, OrderItem, ArchivedOrder, Cart, CartItem
+from .changes import record_changes
+from .jobs import enqueue
+from .tasks import send_order_confirmation
 from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
 
 
 User = get_user_model()
@@ -49,34 +56,48 @@ class ArtisanSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Artisan
-        fields = ['id', 'business_name', 'description', 'location', 
+        fields = ['id', 'business_name', 'description', 'location', 'latitude', 'longitude',
                  'created_at', 'updated_at', 'product_count']
         read_only_fields = ['user']
 
     def get_product_count(self, obj):
         return obj.products.count()
 
+    def validate(self, data):
+        latitude = data.get('latitude', getattr(self.instance, 'latitude', None))
+        longitude = data.get('longitude', getattr(self.instance, 'longitude', None))
+        if (latitude is None) != (longitude is None):
+            raise serializers.ValidationError("Latitude and longitude must be set together")
+        if latitude is not None and not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            raise serializers.ValidationError("Coordinates are out of range")
+        return data
+
 
 class ProductSerializer(serializers.ModelSerializer):
     artisan_name = serializers.CharField(source='artisan.business_name', read_only=True)
+    available = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = Product
         fields = ['id', 'artisan', 'artisan_name', 'name', 'description', 
-                 'price', 'inventory', 'image', 'created_at', 'updated_at']
+                 'price', 'inventory', 'available', 'image', 'created_at', 'updated_at']
         
     def validate_inventory(self, value):
         if value < 0:
             raise serializers.ValidationError("Inventory cannot be negative")
+        if self.instance is not None and value < self.instance.reserved:
+            raise serializers.ValidationError(
+                f"Inventory cannot be lower than the {self.instance.reserved} units held in carts")
         return value
 
 
 class OrderItemSerializer(serializers.ModelSerializer):
-    product_name = serializers.CharField(source='product.name', read_only=True)
-    
     class Meta:
         model = OrderItem
         fields = ['id', 'product', 'product_name', 'quantity', 'price']
+        read_only_fields = ['product_name']
+        # Lines only lose their product when it is deleted later.
+        extra_kwargs = {'product': {'required': True, 'allow_null': False}}
 
     def validate_quantity(self, value):
         if value <= 0:
@@ -102,6 +123,7 @@ class OrderSerializer(serializers.ModelSerializer):
                     "Total amount does not match sum of items")
         return data
 
+    @transaction.atomic
     def create(self, validated_data):
         items_data = validated_data.pop('items')
         # Create order with user from context
@@ -114,13 +136,55 @@ class OrderSerializer(serializers.ModelSerializer):
             product = item_data['product']
             quantity = item_data['quantity']
             
-            if product.inventory < quantity:
+            # Units held in carts are not for sale; check and decrement in
+            # one statement so concurrent orders cannot oversell.
+            sold = Product.objects.filter(
+                pk=product.pk, inventory__gte=F('reserved') + quantity
+            ).update(inventory=F('inventory') - quantity, updated_at=timezone.now())
+            if not sold:
                 raise serializers.ValidationError(
                     f"Not enough inventory for product {product.name}")
+            record_changes(Product, [product.pk])
             
-            product.inventory -= quantity
-            product.save()
-            
-            OrderItem.objects.create(order=order, **item_data)
+            OrderItem.objects.create(order=order, product_name=product.name, **item_data)
         
-        return order
\ No newline at end of file
+        enqueue(send_order_confirmation, str(order.pk))
+        return order
+
+
+class ArchivedOrderSerializer(serializers.ModelSerializer):
+    username = serializers.CharField(source='user.username', read_only=True)
+
+    class Meta:
+        model = ArchivedOrder
+        fields = ['id', 'username', 'status', 'total_amount',
+                 'items', 'created_at', 'updated_at', 'archived_at']
+
+
+class CartItemSerializer(serializers.ModelSerializer):
+    product_name = serializers.CharField(source='product.name', read_only=True)
+    price = serializers.DecimalField(source='product.price', max_digits=10,
+                                     decimal_places=2, read_only=True)
+
+    class Meta:
+        model = CartItem
+        fields = ['id', 'product', 'product_name', 'quantity', 'price', 'expires_at']
+        read_only_fields = ['expires_at']
+
+    def validate_quantity(self, value):
+        if value <= 0:
+            raise serializers.ValidationError("Quantity must be greater than zero")
+        return value
+
+
+class CartSerializer(serializers.ModelSerializer):
+    items = CartItemSerializer(many=True, read_only=True)
+    total_amount = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Cart
+        fields = ['id', 'items', 'total_amount', 'updated_at']
+
+    def get_total_amount(self, obj):
+        total = sum((item.product.price * item.quantity for item in obj.items.all()), Decimal('0.00'))
+        return str(total)
\ No newline at end of file
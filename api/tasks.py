@@ -0,0 +1,100 @@
+"""
+Background tasks run by `manage.py run_worker`.
+"""
+import io
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.mail import send_mail
+from django.utils import timezone
+from PIL import Image
+
+from . import cart
+from .archive import archive_orders
+from .changes import compact_changes, record_changes
+from .idempotency import purge_expired_keys
+from .jobs import task
+from .models import Job, Order, Product
+from .recommendations import build_recommendations
+
+
+@task()
+def send_order_confirmation(order_id):
+    order = Order.objects.select_related('user').prefetch_related('items').filter(pk=order_id).first()
+    if order is None:
+        return
+    lines = [f"{item.quantity}x {item.product_name} @ {item.price}" for item in order.items.all()]
+    send_mail(
+        subject=f"Order {order.id} received",
+        message="\n".join([f"Thank you for your order, {order.user.name or order.user.email}.", "", *lines,
+                           "", f"Total: {order.total_amount}"]),
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        recipient_list=[order.user.email],
+    )
+
+
+@task()
+def process_product_image(product_id):
+    """
+    Downscale product images larger than PRODUCT_IMAGE_MAX_SIZE. The
+    smaller copy is saved under a new name and the original is only deleted
+    once the product points at the copy.
+    """
+    product = Product.objects.filter(pk=product_id).first()
+    if product is None or not product.image:
+        return
+    max_size = settings.PRODUCT_IMAGE_MAX_SIZE
+    with product.image.open('rb') as handle:
+        image = Image.open(handle)
+        image.load()
+    if image.width <= max_size and image.height <= max_size:
+        return
+
+    image_format = image.format or 'JPEG'
+    image.thumbnail((max_size, max_size))
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format)
+
+    storage = product.image.storage
+    name = product.image.name
+    # The original still exists, so the storage picks a fresh name.
+    saved_name = storage.save(name, ContentFile(buffer.getvalue()))
+    # Only switch if the image was not replaced while we worked on it.
+    switched = Product.objects.filter(pk=product.pk, image=name).update(image=saved_name)
+    if not switched:
+        storage.delete(saved_name)
+        return
+    record_changes(Product, [product.pk])
+    storage.delete(name)
+
+
+@task(every=timedelta(minutes=1))
+def sweep_cart_holds():
+    cart.release_expired_holds()
+
+
+@task(every=timedelta(hours=1))
+def purge_idempotency_keys():
+    purge_expired_keys()
+
+
+@task(every=timedelta(days=1))
+def purge_finished_jobs():
+    cutoff = timezone.now() - timedelta(days=settings.JOB_RETENTION_DAYS)
+    Job.objects.filter(status=Job.SUCCEEDED, updated_at__lt=cutoff).delete()
+
+
+@task(every=timedelta(hours=1))
+def compact_change_feed():
+    compact_changes()
+
+
+@task(every=timedelta(hours=1))
+def update_recommendations():
+    build_recommendations()
+
+
+@task(every=timedelta(days=1))
+def archive_old_orders():
+    archive_orders()
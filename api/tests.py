@@ -3,7 +3,52 @@ from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 from django.contrib.auth import get_user_model
-from .models import Artisan, Product, Order
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, connections, transaction
+from django.test import TransactionTestCase, override_settings
+from django.core import mail
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from unittest import mock, skipUnless
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+from PIL import Image
+from .models import (
+    Artisan, Product, Order, OrderItem, ArchivedOrder, IdempotencyKey, CartItem, Job, ChangeEvent, CoPurchase,
+    RecommendationRun,
+)
+from .archive import delete_product
+from .cart import release_expired_holds
+from .changes import compact_changes
+from .geo import geohash_encode, covering_cells, bounding_box
+from .idempotency import purge_expired_keys
+from .jobs import task, enqueue, requeue_stale_jobs, run_pending, schedule_periodic_jobs
+from .tasks import process_product_image
+from .pagination import EstimatedCountPaginator
+from .parsers import FastJSONParser
+from .recommendations import CoOccurrenceMatrix, build_recommendations
+from .db_backends.postgresql.base import DatabaseWrapper as PoolDatabaseWrapper, IdleHealthCheck
+from .throttling import IPTokenBucketThrottle, TokenBucketThrottle, checkout_limiter
+from .uuids import uuid7, uuid7_time
+from .values_serializers import SerializerPlan
+from .db_routers import PrimaryReplicaRouter, replica_health, replica_reads, replica_reads_enabled
+from .renderers import FastJSONRenderer
+from .serializers import ArtisanSerializer, OrderSerializer, ProductSerializer
+from collections import Counter
+from datetime import timedelta
+from decimal import Decimal
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
 import uuid
 
 User = get_user_model()
@@ -134,4 +179,1184 @@ class AuthenticationTests(APITestCase):
         }
         response = self.client.post(url, data)
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
-        self.assertIn('tokens', response.data['data'])
\ No newline at end of file
+        self.assertIn('tokens', response.data['data'])
+
+class JSONRendererTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            password='testpass123',
+            name='Test User'
+        )
+        self.artisan = Artisan.objects.create(
+            user=self.user,
+            business_name='Tëst Shop  ',
+            description='Test Description',
+            location='Test Location'
+        )
+        self.product = Product.objects.create(
+            artisan=self.artisan,
+            name='Test Product',
+            description='Test Description',
+            price='29.90',
+            inventory=10
+        )
+
+    def test_fast_renderer_matches_default_renderer(self):
+        data = {
+            'results': ProductSerializer([self.product], many=True).data,
+            'raw': [self.product.id, Decimal('12.50'), self.product.created_at, 2 ** 70],
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(
+            FastJSONRenderer().render(data, 'application/json; indent=4'),
+            JSONRenderer().render(data, 'application/json; indent=4'))
+
+    def test_fast_renderer_matches_default_renderer_for_floats(self):
+        data = {'distance_km': [0.0, -0.0, 2.5, 1e-4, 1e-5, 1.5e-7, 9999000000000000.0, 1e16, 1e22, 5e-324]}
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        for value in (float('nan'), float('inf'), -float('inf')):
+            with self.assertRaises(ValueError):
+                FastJSONRenderer().render({'distance_km': [1.0, value]})
+
+    def test_fast_parser_rejects_invalid_json(self):
+        parser = FastJSONParser()
+        self.assertEqual(parser.parse(io.BytesIO(b'{"price": "29.90"}')), {'price': '29.90'})
+        with self.assertRaises(ParseError):
+            parser.parse(io.BytesIO(b'{"price": NaN}'))
+        for body in (b'[123456789012345678901234567890, -9223372036854775809]', b'[1e400, 1.5e-7]'):
+            self.assertEqual(parser.parse(io.BytesIO(body)), JSONParser().parse(io.BytesIO(body)))
+
+
+@override_settings(DATABASE_REPLICAS=['replica_0'])
+class ReplicaRoutingTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            password='testpass123',
+            name='Test User'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.artisan = Artisan.objects.create(
+            user=self.user,
+            business_name='Test Shop',
+            description='Test Description',
+            location='Test Location'
+        )
+        self.router = PrimaryReplicaRouter()
+
+    def test_reads_use_healthy_replica_only_when_enabled(self):
+        with mock.patch.object(replica_health, 'is_healthy', return_value=True):
+            self.assertEqual(self.router.db_for_read(Product), 'default')
+            with replica_reads():
+                self.assertEqual(self.router.db_for_read(Product), 'replica_0')
+                self.assertEqual(self.router.db_for_write(Product), 'default')
+        with mock.patch.object(replica_health, 'is_healthy', return_value=False):
+            with replica_reads():
+                self.assertEqual(self.router.db_for_read(Product), 'default')
+
+    def test_user_is_pinned_to_primary_after_write(self):
+        seen = []
+
+        def record(router, model, **hints):
+            seen.append(replica_reads_enabled())
+            return 'default'
+
+        url = reverse('product-list')
+        with mock.patch.object(PrimaryReplicaRouter, 'db_for_read', autospec=True, side_effect=record):
+            self.client.get(url)
+            self.assertIn(True, seen)
+
+            response = self.client.post(url, {
+                'artisan': str(self.artisan.id),
+                'name': 'Test Product',
+                'description': 'Test Description',
+                'price': '29.99',
+                'inventory': 10
+            })
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+            seen.clear()
+            self.client.get(url)
+            self.assertTrue(seen)
+            self.assertNotIn(True, seen)
+        self.assertFalse(replica_reads_enabled())
+
+
+@skipUnless(settings.DATABASE_REPLICAS, 'Set DATABASE_REPLICA_URLS to exercise a real replica.')
+class ReplicaDatabaseTests(TransactionTestCase):
+    databases = '__all__'
+
+    def test_catalogue_list_reads_from_replica(self):
+        cache.clear()
+        replica_health.reset()
+        user = User.objects.create_user(email='test@example.com', password='testpass123')
+        self.client.force_login(user)
+        alias = settings.DATABASE_REPLICAS[0]
+        with mock.patch('api.db_routers.random.choice', return_value=alias), \
+                CaptureQueriesContext(connections[alias]) as replica_queries:
+            response = self.client.get(reverse('artisan-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(replica_queries.captured_queries)
+
+
+class ConnectionPoolTests(APITestCase):
+    def test_idle_health_check_skips_recently_returned_connections(self):
+        class FakeConnection:
+            pass
+
+        ping = mock.Mock()
+        check = IdleHealthCheck(idle_seconds=30, ping=ping)
+        connection = FakeConnection()
+
+        check(connection)
+        self.assertEqual(ping.call_count, 1)
+
+        check.returned(connection)
+        check(connection)
+        self.assertEqual(ping.call_count, 1)
+
+        with mock.patch('api.db_backends.postgresql.base.time.monotonic', return_value=time.monotonic() + 60):
+            check(connection)
+        self.assertEqual(ping.call_count, 2)
+        self.assertEqual(check.checks, 2)
+
+    def test_pool_is_created_once_under_concurrent_first_use(self):
+        settings_dict = {**connections['default'].settings_dict, 'OPTIONS': {'pool': True}}
+        wrapper = PoolDatabaseWrapper(settings_dict, alias='pool-race')
+
+        def create_pool(pool_options):
+            time.sleep(0.01)
+            return mock.Mock()
+
+        with mock.patch.object(PoolDatabaseWrapper, '_create_pool', side_effect=create_pool) as created:
+            pools = []
+            threads = [threading.Thread(target=lambda: pools.append(wrapper.pool)) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        del PoolDatabaseWrapper._connection_pools['pool-race']
+        self.assertEqual(created.call_count, 1)
+        self.assertEqual(len(set(map(id, pools))), 1)
+
+    def test_pool_stats_requires_admin(self):
+        url = reverse('database-pool-stats')
+        user = User.objects.create_user(email='test@example.com', password='testpass123')
+        self.client.force_authenticate(user=user)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+
+        admin = User.objects.create_superuser(email='admin@example.com', password='testpass123', username='admin')
+        self.client.force_authenticate(user=admin)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['data'], {})
+
+
+class ThrottlingTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+
+    def register(self, email):
+        return self.client.post(reverse('register'), {
+            'email': email,
+            'name': 'Test User',
+            'password': 'testpass123',
+            'password_confirm': 'testpass123'
+        })
+
+    def test_auth_bucket_allows_burst_then_throttles(self):
+        with mock.patch.object(TokenBucketThrottle, 'THROTTLE_RATES', {'auth': '2/min'}), \
+                mock.patch.object(TokenBucketThrottle, 'timer', return_value=1000.0):
+            self.assertEqual(self.register('one@example.com').status_code, status.HTTP_201_CREATED)
+            self.assertEqual(self.register('two@example.com').status_code, status.HTTP_201_CREATED)
+            response = self.register('three@example.com')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response['Retry-After'], '30')
+
+    def test_bucket_refills_over_time(self):
+        with mock.patch.object(TokenBucketThrottle, 'THROTTLE_RATES', {'auth': '1/min'}), \
+                mock.patch.object(TokenBucketThrottle, 'timer', side_effect=[1000.0, 1001.0, 1061.0]):
+            self.assertEqual(self.register('one@example.com').status_code, status.HTTP_201_CREATED)
+            self.assertEqual(self.register('two@example.com').status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+            self.assertEqual(self.register('two@example.com').status_code, status.HTTP_201_CREATED)
+
+    def test_concurrent_requests_cannot_share_a_token(self):
+        view = mock.Mock(throttle_scope='auth')
+        request = APIRequestFactory().post('/')
+        allowed = []
+
+        def attempt():
+            allowed.append(IPTokenBucketThrottle().allow_request(request, view))
+
+        with mock.patch.object(TokenBucketThrottle, 'THROTTLE_RATES', {'auth': '5/min'}):
+            threads = [threading.Thread(target=attempt) for _ in range(20)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(allowed.count(True), 5)
+
+    def test_stuck_lock_does_not_throttle_clients_under_the_limit(self):
+        view = mock.Mock(throttle_scope='auth')
+        request = APIRequestFactory().post('/')
+        throttle = IPTokenBucketThrottle()
+        with mock.patch.object(TokenBucketThrottle, 'THROTTLE_RATES', {'auth': '2/min'}), \
+                mock.patch.object(throttle, 'timer', return_value=1000.0), \
+                mock.patch('api.throttling.time.sleep'):
+            # Held by a worker that never released it.
+            throttle.scope = 'auth'
+            lock_key = throttle.get_cache_key(request, view) + ':lock'
+            throttle.cache.set(lock_key, 1)
+            self.assertEqual([throttle.allow_request(request, view) for _ in range(3)], [True, True, False])
+            self.assertEqual(throttle.cache.get(lock_key), 1)
+
+    def test_checkout_sheds_load_when_too_many_in_flight(self):
+        user = User.objects.create_user(email='test@example.com', password='testpass123')
+        self.client.force_authenticate(user=user)
+        with override_settings(CHECKOUT_MAX_IN_FLIGHT=1), checkout_limiter.slot():
+            response = self.client.post(reverse('order-list'), {'items': [], 'total_amount': '0'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response['Retry-After'], '2')
+        self.assertEqual(checkout_limiter.in_flight, 0)
+
+
+class IdempotencyTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            password='testpass123',
+            name='Test User'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.artisan = Artisan.objects.create(
+            user=self.user,
+            business_name='Test Shop',
+            description='Test Description',
+            location='Test Location'
+        )
+        self.product = Product.objects.create(
+            artisan=self.artisan,
+            name='Test Product',
+            description='Test Description',
+            price='29.99',
+            inventory=10
+        )
+        self.url = reverse('order-list')
+        self.data = {
+            'items': [{
+                'product': str(self.product.id),
+                'quantity': 2,
+                'price': '29.99'
+            }],
+            'total_amount': '59.98',
+            'status': 'pending'
+        }
+
+    def post(self, data, key='order-1'):
+        return self.client.post(self.url, data, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_replays_stored_response(self):
+        first = self.post(self.data)
+        second = self.post(self.data)
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(Order.objects.count(), 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.inventory, 8)
+
+    def test_key_reused_with_different_payload_is_rejected(self):
+        self.post(self.data)
+        response = self.post({**self.data, 'status': 'confirmed'})
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Order.objects.count(), 1)
+
+    @override_settings(IDEMPOTENCY_WAIT_TIMEOUT=0)
+    def test_duplicate_of_in_flight_request_gets_conflict(self):
+        self.post(self.data)
+        IdempotencyKey.objects.update(response_status=None, response_body=None,
+                                      locked_until=timezone.now() + timedelta(minutes=1))
+        response = self.post(self.data)
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertIn('Retry-After', response)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_duplicate_waits_for_in_flight_request(self):
+        first = self.post(self.data)
+        IdempotencyKey.objects.update(response_status=None, response_body=None,
+                                      locked_until=timezone.now() + timedelta(minutes=1))
+
+        def first_request_finishes(seconds):
+            IdempotencyKey.objects.update(response_status=201, response_body=first.json(), locked_until=None)
+
+        with mock.patch('api.idempotency.time.sleep', side_effect=first_request_finishes) as slept:
+            response = self.post(self.data)
+        self.assertEqual(slept.call_count, 1)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response['Idempotent-Replayed'], 'true')
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_retry_takes_over_key_after_lease_runs_out(self):
+        self.post(self.data)
+        IdempotencyKey.objects.update(response_status=None, response_body=None, locked_until=timezone.now())
+        response = self.post(self.data)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn('Idempotent-Replayed', response)
+        record = IdempotencyKey.objects.get()
+        self.assertEqual((record.response_status, record.locked_until), (201, None))
+
+    def test_failed_request_is_not_stored(self):
+        response = self.post({**self.data, 'items': [{**self.data['items'][0], 'quantity': 100}]})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_purge_removes_expired_keys(self):
+        self.post(self.data, key='old')
+        self.post(self.data, key='new')
+        IdempotencyKey.objects.filter(key='old').update(expires_at=timezone.now())
+        self.assertEqual(purge_expired_keys(batch_size=1), 1)
+        self.assertEqual(list(IdempotencyKey.objects.values_list('key', flat=True)), ['new'])
+
+
+class CartTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            password='testpass123',
+            name='Test User'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.artisan = Artisan.objects.create(
+            user=self.user,
+            business_name='Test Shop',
+            description='Test Description',
+            location='Test Location'
+        )
+        self.product = Product.objects.create(
+            artisan=self.artisan,
+            name='Test Product',
+            description='Test Description',
+            price='29.99',
+            inventory=3
+        )
+
+    def add(self, quantity):
+        return self.client.post(reverse('cart-add-item'), {
+            'product': str(self.product.id),
+            'quantity': quantity
+        }, format='json')
+
+    def test_add_to_cart_holds_inventory(self):
+        self.assertEqual(self.add(2).status_code, status.HTTP_201_CREATED)
+        response = self.add(1)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['items'][0]['quantity'], 3)
+        self.assertEqual(response.data['total_amount'], '89.97')
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.inventory, self.product.reserved, self.product.available), (3, 3, 0))
+
+        # Held units can no longer be added to carts or sold directly.
+        self.assertEqual(self.add(1).status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(reverse('order-list'), {
+            'items': [{'product': str(self.product.id), 'quantity': 1, 'price': '29.99'}],
+            'total_amount': '29.99',
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Order.objects.count(), 0)
+
+    def test_checkout_converts_cart_to_order(self):
+        self.add(2)
+        response = self.client.post(reverse('cart-checkout'))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['total_amount'], '59.98')
+        self.assertEqual(response.data['items'][0]['quantity'], 2)
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.inventory, self.product.reserved), (1, 0))
+        self.assertFalse(CartItem.objects.exists())
+        self.assertEqual(self.client.post(reverse('cart-checkout')).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_checkout_rejects_expired_and_oversold_holds(self):
+        self.add(2)
+        CartItem.objects.update(expires_at=timezone.now())
+        response = self.client.post(reverse('cart-checkout'))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        CartItem.objects.update(expires_at=timezone.now() + timedelta(minutes=5))
+        Product.objects.filter(pk=self.product.pk).update(inventory=1)
+        response = self.client.post(reverse('cart-checkout'))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Order.objects.count(), 0)
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.inventory, self.product.reserved), (1, 2))
+
+    def test_inventory_cannot_drop_below_reserved(self):
+        self.add(2)
+        url = reverse('product-detail', kwargs={'pk': self.product.pk})
+        response = self.client.patch(url, {'inventory': 1}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.patch(url, {'inventory': 2}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['available'], 0)
+
+    def test_remove_item_releases_hold(self):
+        item_id = self.add(2).data['items'][0]['id']
+        response = self.client.delete(reverse('cart-remove-item', kwargs={'item_id': item_id}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['items'], [])
+        for missing in (item_id, 'not-a-uuid'):
+            response = self.client.delete(reverse('cart-remove-item', kwargs={'item_id': missing}))
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.reserved, 0)
+
+    def test_sweeper_releases_expired_holds_in_batches(self):
+        other = Product.objects.create(
+            artisan=self.artisan, name='Other', description='Other', price='5.00', inventory=5)
+        self.add(2)
+        self.client.post(reverse('cart-add-item'), {'product': str(other.id), 'quantity': 4}, format='json')
+        CartItem.objects.filter(product=self.product).update(expires_at=timezone.now())
+
+        self.assertEqual(release_expired_holds(batch_size=1), 1)
+        self.product.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(self.product.reserved, 0)
+        self.assertEqual(other.reserved, 4)
+
+    def test_product_update_does_not_overwrite_reserved(self):
+        stale = Product.objects.get(pk=self.product.pk)
+        self.add(2)
+        stale.inventory = 10
+        stale.save()
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.inventory, self.product.reserved), (10, 2))
+
+
+class ProductFacetTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            password='testpass123',
+            name='Test User'
+        )
+        self.client.force_authenticate(user=self.user)
+        other_user = User.objects.create_user(email='other@example.com', password='testpass123', username='other')
+        self.lagos = Artisan.objects.create(
+            user=self.user, business_name='Lagos Shop', description='Shop', location='Lagos')
+        self.abuja = Artisan.objects.create(
+            user=other_user, business_name='Abuja Shop', description='Shop', location='Abuja')
+        for artisan, price, inventory in [
+            (self.lagos, '10.00', 5), (self.lagos, '30.00', 0), (self.lagos, '300.00', 2), (self.abuja, '45.00', 1),
+        ]:
+            Product.objects.create(artisan=artisan, name=f'Item {price}', description='Item',
+                                   price=price, inventory=inventory)
+
+    def test_range_stock_and_location_filters(self):
+        url = reverse('product-list')
+        response = self.client.get(url, {'price__gte': '20', 'price__lte': '100'})
+        self.assertEqual([p['price'] for p in response.data['results']], ['30.00', '45.00'])
+        response = self.client.get(url, {'in_stock': 'true', 'location': 'lagos'})
+        self.assertEqual([p['price'] for p in response.data['results']], ['10.00', '300.00'])
+        response = self.client.get(url, {'inventory__lte': 1})
+        self.assertEqual(response.data['count'], 2)
+
+    def test_facets_are_counted_in_one_query_and_cached(self):
+        url = reverse('product-list')
+        with CaptureQueriesContext(connections['default']) as uncached:
+            response = self.client.get(url, {'facets': 'true', 'price__lte': '100'})
+        facets = response.data['facets']
+        self.assertEqual([bucket['count'] for bucket in facets['price']], [1, 2, 0, 0, 0])
+        self.assertEqual(facets['artisan'][0]['name'], 'Lagos Shop')
+        self.assertEqual(facets['artisan'][0]['count'], 2)
+        self.assertEqual(facets['location'], [{'location': 'Lagos', 'count': 2}, {'location': 'Abuja', 'count': 1}])
+
+        with CaptureQueriesContext(connections['default']) as cached:
+            response = self.client.get(url, {'facets': 'true', 'price__lte': '100', 'page': 1})
+        self.assertEqual(response.data['facets'], facets)
+        self.assertEqual(len(uncached.captured_queries) - len(cached.captured_queries), 1)
+        self.assertNotIn('facets', self.client.get(url).data)
+
+
+class ProximitySearchTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='test@example.com', password='testpass123', name='Test User')
+        self.client.force_authenticate(user=self.user)
+        self.artisans = {}
+        for index, (name, location, point) in enumerate([
+            ('Ikeja Crafts', 'Ikeja, Lagos', (6.6018, 3.3515)),
+            ('Lekki Crafts', 'Lekki', (6.4698, 3.5852)),
+            ('Ibadan Crafts', 'Ibadan', (7.3775, 3.9470)),
+            ('Unplaced Crafts', 'Somewhere', (None, None)),
+        ]):
+            user = self.user if index == 0 else User.objects.create_user(
+                email=f'artisan{index}@example.com', password='testpass123', username=f'artisan{index}')
+            self.artisans[name] = Artisan.objects.create(
+                user=user, business_name=name, description='Crafts', location=location,
+                latitude=point[0], longitude=point[1])
+        for artisan in self.artisans.values():
+            Product.objects.create(artisan=artisan, name=f'{artisan.business_name} basket',
+                                   description='Basket', price='10.00', inventory=1)
+
+    def test_geohash_cells_cover_bounding_box(self):
+        self.assertEqual(geohash_encode(57.64911, 10.40744, 11), 'u4pruydqqvj')
+        self.assertEqual(self.artisans['Ikeja Crafts'].geocell, geohash_encode(6.6018, 3.3515))
+        self.assertEqual(self.artisans['Unplaced Crafts'].geocell, '')
+        cells = covering_cells(bounding_box(6.6018, 3.3515, 30))
+        self.assertTrue(cells)
+        self.assertTrue(any(self.artisans['Lekki Crafts'].geocell.startswith(cell) for cell in cells))
+
+    def test_artisans_near_point_ordered_by_distance(self):
+        response = self.client.get(reverse('artisan-list'), {'near': '6.60,3.35', 'radius': 50})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        names = [artisan['business_name'] for artisan in response.data['results']]
+        self.assertEqual(names, ['Ikeja Crafts', 'Lekki Crafts'])
+
+    def test_products_near_point(self):
+        response = self.client.get(reverse('product-list'), {'near': '7.38,3.95', 'radius': 10})
+        self.assertEqual([p['artisan_name'] for p in response.data['results']], ['Ibadan Crafts'])
+        response = self.client.get(reverse('product-list'), {'near': 'lagos'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_geocode_command_fills_missing_coordinates(self):
+        artisan = self.artisans['Unplaced Crafts']
+        Artisan.objects.filter(pk=artisan.pk).update(location='Abeokuta, Ogun')
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as gazetteer:
+            gazetteer.write('name,latitude,longitude\nOyo,north,3.93\nAbeokuta,7.1475,3.3619\nIwo,7.63\n')
+        self.addCleanup(os.unlink, gazetteer.name)
+        stderr = io.StringIO()
+        call_command('geocode_artisans', gazetteer.name, stdout=io.StringIO(), stderr=stderr)
+        self.assertIn('line 2', stderr.getvalue())
+        self.assertIn('line 4', stderr.getvalue())
+        artisan.refresh_from_db()
+        self.assertEqual((artisan.latitude, artisan.longitude), (7.1475, 3.3619))
+        self.assertEqual(artisan.geocell, geohash_encode(7.1475, 3.3619))
+
+
+_flaky_calls = []
+
+
+@task(name='tests.flaky', max_attempts=2)
+def flaky_task(value):
+    _flaky_calls.append(value)
+    raise RuntimeError('boom')
+
+
+class JobQueueTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        _flaky_calls.clear()
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            password='testpass123',
+            name='Test User'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.artisan = Artisan.objects.create(
+            user=self.user,
+            business_name='Test Shop',
+            description='Test Description',
+            location='Test Location'
+        )
+        self.product = Product.objects.create(
+            artisan=self.artisan,
+            name='Test Product',
+            description='Test Description',
+            price='29.99',
+            inventory=10
+        )
+
+    def test_order_confirmation_is_queued_on_commit_and_sent_by_worker(self):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            response = self.client.post(reverse('order-list'), {
+                'items': [{'product': str(self.product.id), 'quantity': 2, 'price': '29.99'}],
+                'total_amount': '59.98',
+            }, format='json')
+            self.assertFalse(Job.objects.exists())
+        for callback in callbacks:
+            callback()
+
+        job = Job.objects.get()
+        self.assertEqual((job.name, job.args), ('api.tasks.send_order_confirmation', [response.data['id']]))
+        call_command('run_worker', '--once', stdout=io.StringIO())
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.SUCCEEDED)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['test@example.com'])
+        self.assertIn('2x Test Product', mail.outbox[0].body)
+
+    def test_failed_job_is_retried_with_backoff_then_failed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            enqueue(flaky_task, 'x')
+        self.assertEqual(run_pending(), 1)
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertIn('RuntimeError: boom', job.last_error)
+
+        # Not due yet, so nothing runs until the backoff has passed.
+        self.assertEqual(run_pending(), 0)
+        Job.objects.update(run_at=timezone.now())
+        run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+        self.assertEqual(_flaky_calls, ['x', 'x'])
+
+    def test_image_is_downscaled_into_a_new_file_before_the_original_is_removed(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        buffer = io.BytesIO()
+        Image.new('RGB', (40, 20)).save(buffer, format='PNG')
+        with override_settings(MEDIA_ROOT=media_root, PRODUCT_IMAGE_MAX_SIZE=10):
+            self.product.image.save('basket.png', ContentFile(buffer.getvalue()))
+            original = self.product.image.name
+            process_product_image(str(self.product.pk))
+            self.product.refresh_from_db()
+            storage = self.product.image.storage
+            self.assertNotEqual(self.product.image.name, original)
+            self.assertFalse(storage.exists(original))
+            with self.product.image.open('rb') as handle:
+                self.assertEqual(Image.open(handle).size, (10, 5))
+
+    def test_stale_jobs_are_requeued_until_out_of_attempts(self):
+        locked_at = timezone.now() - timedelta(seconds=settings.JOB_LOCK_TIMEOUT_SECONDS + 1)
+        retry, exhausted = [
+            Job.objects.create(name='tests.flaky', status=Job.RUNNING, locked_at=locked_at,
+                               locked_by='gone:1', attempts=attempts, max_attempts=2)
+            for attempts in (1, 2)
+        ]
+        self.assertEqual(requeue_stale_jobs(), 1)
+        retry.refresh_from_db()
+        exhausted.refresh_from_db()
+        self.assertEqual((retry.status, retry.locked_by), (Job.QUEUED, ''))
+        self.assertEqual(exhausted.status, Job.FAILED)
+        self.assertTrue(exhausted.last_error)
+
+    def test_periodic_jobs_are_scheduled_once(self):
+        schedule_periodic_jobs()
+        schedule_periodic_jobs()
+        names = list(Job.objects.values_list('name', flat=True))
+        self.assertIn('api.tasks.sweep_cart_holds', names)
+        self.assertEqual(len(names), len(set(names)))
+        # A worker that lost the race to the check above cannot insert a twin.
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Job.objects.create(name='api.tasks.sweep_cart_holds', periodic=True)
+
+
+class ChangeFeedTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            password='testpass123',
+            name='Test User'
+        )
+        self.staff = User.objects.create_user(
+            email='sync@example.com', password='testpass123', username='sync', is_staff=True)
+        self.client.force_authenticate(user=self.user)
+        self.artisan = Artisan.objects.create(
+            user=self.user,
+            business_name='Test Shop',
+            description='Test Description',
+            location='Test Location'
+        )
+
+    def changes(self, since=0, **params):
+        self.client.force_authenticate(user=self.staff)
+        response = self.client.get(reverse('change-feed'), {'since': since, **params})
+        self.client.force_authenticate(user=self.user)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_feed_reports_creates_updates_and_deletes_in_order(self):
+        start = self.changes()['cursor']
+        response = self.client.post(reverse('product-list'), {
+            'artisan': str(self.artisan.id),
+            'name': 'Test Product',
+            'description': 'Test Description',
+            'price': '29.99',
+            'inventory': 5
+        })
+        product_id = response.data['id']
+        url = reverse('product-detail', args=[product_id])
+        self.client.patch(url, {'price': '19.99'})
+        self.client.delete(url)
+
+        first = self.changes(start, limit=2)
+        self.assertTrue(first['has_more'])
+        rest = self.changes(first['cursor'], limit=2)
+        self.assertFalse(rest['has_more'])
+        events = first['results'] + rest['results']
+        self.assertEqual([(e['model'], str(e['id']), e['action']) for e in events], [
+            ('product', product_id, 'created'),
+            ('product', product_id, 'updated'),
+            ('product', product_id, 'deleted'),
+        ])
+        self.assertTrue(all(e['data'] is None for e in events))
+
+    def test_event_carries_current_state(self):
+        start = self.changes()['cursor']
+        self.artisan.description = 'Updated'
+        self.artisan.save()
+        [event] = self.changes(start)['results']
+        self.assertEqual((event['action'], event['data']['description']), ('updated', 'Updated'))
+
+    def test_bulk_inventory_updates_and_cascades_are_recorded(self):
+        product = Product.objects.create(
+            artisan=self.artisan, name='Test Product', description='Test Description',
+            price='29.99', inventory=3)
+        start = self.changes()['cursor']
+        self.client.post(reverse('cart-add-item'), {'product': str(product.id), 'quantity': 1}, format='json')
+        with self.captureOnCommitCallbacks():
+            self.client.post(reverse('cart-checkout'))
+        self.artisan.delete()
+
+        events = [(e['model'], e['action']) for e in self.changes(start)['results']]
+        # The cart hold is not an event; the sale at checkout is.
+        self.assertEqual(events.count(('product', 'updated')), 1)
+        self.assertIn(('order', 'created'), events)
+        self.assertIn(('product', 'deleted'), events)
+        self.assertIn(('artisan', 'deleted'), events)
+
+    def test_product_data_omits_available(self):
+        product = Product.objects.create(
+            artisan=self.artisan, name='Test Product', description='Test Description',
+            price='29.99', inventory=3)
+        start = self.changes()['cursor']
+        product.price = '19.99'
+        product.save()
+        # Holds change `available` without an event, so the feed leaves it out.
+        self.client.post(reverse('cart-add-item'), {'product': str(product.id), 'quantity': 1}, format='json')
+        [event] = self.changes(start)['results']
+        self.assertEqual(event['data']['inventory'], 3)
+        self.assertNotIn('available', event['data'])
+
+    def test_late_commits_are_numbered_after_served_events(self):
+        start = self.changes()['cursor']
+        # An event with a lower id that only commits after a later one was
+        # served, as when one transaction outlives another.
+        late = ChangeEvent.objects.create(model='artisan', object_id=self.artisan.pk, action=ChangeEvent.UPDATED)
+        self.artisan.save()
+        ChangeEvent.objects.filter(pk=late.pk).delete()
+        served = self.changes(start)
+        self.assertEqual(len(served['results']), 1)
+
+        late.save(force_insert=True)
+        [event] = self.changes(served['cursor'])['results']
+        self.assertEqual(event['cursor'], served['cursor'] + 1)
+        self.assertLess(late.pk, ChangeEvent.objects.get(sequence=served['cursor']).pk)
+
+    def test_feed_requires_staff(self):
+        response = self.client.get(reverse('change-feed'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    @override_settings(CHANGE_FEED_COMPACT_AFTER_SECONDS=0, CHANGE_FEED_TOMBSTONE_DAYS=1)
+    def test_compaction_keeps_latest_event_per_object(self):
+        product = Product.objects.create(
+            artisan=self.artisan, name='Test Product', description='Test Description',
+            price='29.99', inventory=3)
+        product.save()
+        product.delete()
+        self.artisan.save()
+        ChangeEvent.objects.update(created_at=timezone.now() - timezone.timedelta(hours=1))
+
+        compact_changes()
+        self.assertEqual(sorted(ChangeEvent.objects.values_list('model', 'action')),
+                         [('artisan', 'updated'), ('product', 'deleted')])
+        ChangeEvent.objects.filter(action=ChangeEvent.DELETED).update(
+            created_at=timezone.now() - timezone.timedelta(days=2))
+        compact_changes()
+        self.assertEqual(list(ChangeEvent.objects.values_list('model', flat=True)), ['artisan'])
+
+    @override_settings(CHANGE_FEED_COMPACT_AFTER_SECONDS=0)
+    def test_compaction_follows_sequence_not_id(self):
+        object_id = uuid.uuid4()
+        old = timezone.now() - timezone.timedelta(hours=1)
+        # The lower id committed last, so it was numbered last.
+        first, second = ChangeEvent.objects.bulk_create([
+            ChangeEvent(model='product', object_id=object_id, action=ChangeEvent.DELETED, created_at=old),
+            ChangeEvent(model='product', object_id=object_id, action=ChangeEvent.UPDATED, created_at=old),
+        ])
+        ChangeEvent.objects.filter(pk=second.pk).update(sequence=1)
+        ChangeEvent.objects.filter(pk=first.pk).update(sequence=2)
+        ChangeEvent.objects.create(model='product', object_id=uuid.uuid4(), sequence=3, created_at=old)
+
+        compact_changes()
+        self.assertEqual(list(ChangeEvent.objects.filter(object_id=object_id).values_list('action', flat=True)),
+                         [ChangeEvent.DELETED])
+
+
+class AdminChangelistTests(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(email='admin@example.com', password='testpass123', username='admin')
+        self.client.force_login(self.admin)
+        self.rows = 0
+
+    def add_rows(self, count):
+        for _ in range(count):
+            self.rows += 1
+            user = User.objects.create_user(
+                email=f'user{self.rows}@example.com', password='testpass123', username=f'user{self.rows}')
+            artisan = Artisan.objects.create(
+                user=user, business_name=f'Shop {self.rows}', description='Test Description', location='Lagos')
+            product = Product.objects.create(
+                artisan=artisan, name=f'Product {self.rows}', description='Test Description',
+                price='10.00', inventory=5)
+            order = Order.objects.create(user=user, total_amount='10.00')
+            OrderItem.objects.create(order=order, product=product, quantity=1, price='10.00')
+
+    def changelist_queries(self, model):
+        with CaptureQueriesContext(connections['default']) as queries:
+            response = self.client.get(reverse(f'admin:api_{model}_changelist'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(queries)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        for model in ['product', 'order', 'orderitem']:
+            with self.subTest(model=model):
+                self.add_rows(1)
+                single = self.changelist_queries(model)
+                self.add_rows(5)
+                self.assertEqual(self.changelist_queries(model), single)
+
+    def test_paginator_uses_estimate_for_large_results(self):
+        self.add_rows(2)
+        paginator = EstimatedCountPaginator(Product.objects.all(), 1)
+        with mock.patch('api.pagination.estimate_count', return_value=2_000_000):
+            self.assertEqual(paginator.count, 2_000_000)
+
+        # Small estimates and databases without one fall back to COUNT(*).
+        with mock.patch('api.pagination.estimate_count', return_value=5):
+            self.assertEqual(EstimatedCountPaginator(Product.objects.all(), 1).count, 2)
+        self.assertEqual(EstimatedCountPaginator(Product.objects.all(), 1).count, 2)
+
+
+class RecommendationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            password='testpass123',
+            name='Test User'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.artisan = Artisan.objects.create(
+            user=self.user,
+            business_name='Test Shop',
+            description='Test Description',
+            location='Test Location'
+        )
+        self.products = {
+            name: Product.objects.create(artisan=self.artisan, name=name, description='Test Description',
+                                         price='10.00', inventory=100)
+            for name in 'ABCDE'
+        }
+
+    def order(self, names, status='pending'):
+        order = Order.objects.create(user=self.user, total_amount='0.00', status=status)
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=self.products[name], quantity=1, price='10.00') for name in names
+        ])
+        return order
+
+    def related(self, name):
+        response = self.client.get(reverse('product-related', args=[self.products[name].id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [product['name'] for product in response.data]
+
+    def test_matrix_counts_pairs_across_folds(self):
+        baskets = [['a', 'b', 'c'], ['a', 'b'], ['c', 'a'], ['d'], ['b', 'c', 'd']]
+        matrix = CoOccurrenceMatrix(buffer_size=4)
+        expected = Counter()
+        for basket in baskets:
+            matrix.add_basket(basket)
+            expected.update((x, y) for x in basket for y in basket if x != y)
+        counted = {(product, other): count for product, row in matrix.rows() for other, count in row}
+        self.assertEqual(counted, dict(expected))
+
+    def test_matrix_keeps_few_runs_over_many_folds(self):
+        matrix = CoOccurrenceMatrix(buffer_size=2)
+        expected = Counter()
+        for number in range(500):
+            basket = [number % 97, number % 89 + 100]
+            matrix.add_basket(basket)
+            expected.update([(basket[0], basket[1]), (basket[1], basket[0])])
+        # 500 folds, but runs grow geometrically.
+        self.assertLessEqual(len(matrix._runs), 10)
+        counted = {(product, other): count for product, row in matrix.rows() for other, count in row}
+        self.assertEqual(counted, dict(expected))
+
+    def test_related_products_ranked_by_co_purchases(self):
+        self.order('AB')
+        self.order('AB')
+        self.order('AC')
+        self.order('BCD')
+        self.order('AE', status='cancelled')
+        run = build_recommendations()
+        self.assertEqual((run.full, run.orders), (True, 4))
+
+        self.assertEqual(self.related('A'), ['B', 'C'])
+        self.assertEqual(self.related('E'), [])
+        with self.assertNumQueries(2):
+            self.related('D')
+
+    def test_incremental_build_folds_in_new_orders(self):
+        self.order('AB')
+        self.order('AB')
+        self.order('AC')
+        build_recommendations()
+        self.order('AC')
+        self.order('AC')
+
+        run = build_recommendations()
+        self.assertEqual((run.full, run.orders), (False, 2))
+        self.assertEqual(self.related('A'), ['C', 'B'])
+        self.assertEqual(CoPurchase.objects.get(product=self.products['C'], other=self.products['A']).orders, 3)
+        self.assertEqual(build_recommendations().orders, 0)
+
+        incremental = sorted(CoPurchase.objects.values_list('product', 'other', 'orders'))
+        call_command('build_recommendations', '--full', stdout=io.StringIO())
+        self.assertEqual(sorted(CoPurchase.objects.values_list('product', 'other', 'orders')), incremental)
+
+    def test_late_committed_order_is_counted_once(self):
+        self.order('AB')
+        build_recommendations()
+        # Committed after the build, but created (stamped) before it.
+        late = self.order('AB')
+        Order.objects.filter(pk=late.pk).update(created_at=timezone.now() - timezone.timedelta(hours=1))
+
+        self.assertEqual(build_recommendations().orders, 1)
+        self.assertEqual(build_recommendations().orders, 0)
+        self.assertEqual(CoPurchase.objects.get(product=self.products['A'], other=self.products['B']).orders, 2)
+        self.assertFalse(Order.objects.filter(in_recommendations=False).exists())
+
+    def test_overlapping_run_is_skipped(self):
+        self.order('AB')
+        build_recommendations()
+        self.order('AB')
+        with mock.patch('api.recommendations._try_run_lock', return_value=False):
+            self.assertIsNone(build_recommendations())
+            out = io.StringIO()
+            call_command('build_recommendations', stdout=out)
+        self.assertIn('skipped', out.getvalue())
+        self.assertEqual(RecommendationRun.objects.count(), 1)
+        self.assertEqual(CoPurchase.objects.get(product=self.products['A'], other=self.products['B']).orders, 1)
+
+        self.assertEqual(build_recommendations().orders, 1)
+        self.assertEqual(CoPurchase.objects.get(product=self.products['A'], other=self.products['B']).orders, 2)
+
+    @override_settings(RECOMMENDATION_TOP_K=1, RECOMMENDATION_MAX_BASKET=3)
+    def test_top_k_and_bulk_orders(self):
+        self.order('AB')
+        self.order('AC')
+        self.order('AC')
+        self.order('ABDE')
+        build_recommendations()
+        self.assertEqual(self.related('A'), ['C'])
+        self.assertEqual(self.related('D'), [])
+
+
+class OrderArchiveTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            password='testpass123',
+            name='Test User'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.artisan = Artisan.objects.create(
+            user=self.user,
+            business_name='Test Shop',
+            description='Test Description',
+            location='Test Location'
+        )
+        self.product = Product.objects.create(
+            artisan=self.artisan,
+            name='Test Product',
+            description='Test Description',
+            price='29.99',
+            inventory=10
+        )
+
+    def order(self, status, days_ago):
+        order = Order.objects.create(user=self.user, total_amount='29.99', status=status)
+        OrderItem.objects.create(order=order, product=self.product, product_name=self.product.name,
+                                 quantity=1, price='29.99')
+        Order.objects.filter(pk=order.pk).update(created_at=timezone.now() - timezone.timedelta(days=days_ago))
+        return order
+
+    def test_archive_moves_old_closed_orders_in_batches(self):
+        delivered = self.order('delivered', 400)
+        cancelled = self.order('cancelled', 100)
+        open_order = self.order('pending', 400)
+        recent = self.order('delivered', 5)
+
+        output = io.StringIO()
+        call_command('archive_orders', '--days', '30', '--batch-size', '1', stdout=output)
+        self.assertIn('Archived 2 orders', output.getvalue())
+        self.assertEqual(set(Order.objects.values_list('pk', flat=True)), {open_order.pk, recent.pk})
+        self.assertEqual(OrderItem.objects.count(), 2)
+        self.assertEqual(
+            set(ChangeEvent.objects.filter(action=ChangeEvent.ARCHIVED).values_list('object_id', flat=True)),
+            {delivered.pk, cancelled.pk})
+
+        response = self.client.get(reverse('order-archived'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([order['id'] for order in response.data['results']],
+                         [str(cancelled.pk), str(delivered.pk)])
+        response = self.client.get(reverse('order-archived-detail', args=[delivered.pk]))
+        self.assertEqual(response.data['items'][0]['product_name'], 'Test Product')
+        self.assertEqual(response.data['items'][0]['product'], str(self.product.pk))
+        self.assertEqual(self.client.get(reverse('order-archived-detail', args=['nope'])).status_code,
+                         status.HTTP_404_NOT_FOUND)
+
+        other = User.objects.create_user(email='other@example.com', password='testpass123', username='other')
+        self.client.force_authenticate(user=other)
+        self.assertEqual(self.client.get(reverse('order-archived-detail', args=[delivered.pk])).status_code,
+                         status.HTTP_404_NOT_FOUND)
+
+    def test_deleting_product_keeps_order_history(self):
+        self.order('delivered', 1)
+        self.order('pending', 1)
+        response = self.client.delete(reverse('product-detail', args=[self.product.id]))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(Product.objects.exists())
+
+        response = self.client.get(reverse('order-list'))
+        items = [item for order in response.data['results'] for item in order['items']]
+        self.assertEqual([(item['product'], item['product_name']) for item in items],
+                         [(None, 'Test Product'), (None, 'Test Product')])
+
+    def test_admin_deletes_go_through_delete_product(self):
+        self.order('delivered', 1)
+        other = Product.objects.create(
+            artisan=self.artisan, name='Other Product', description='Test Description', price='5.00')
+        admin_user = User.objects.create_superuser(
+            email='admin@example.com', password='testpass123', username='admin')
+        self.client.force_login(admin_user)
+        with mock.patch('api.admin.delete_product', wraps=delete_product) as deleted:
+            response = self.client.post(reverse('admin:api_product_changelist'), {
+                'action': 'delete_selected', '_selected_action': [other.pk], 'post': 'yes'})
+        self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+        self.assertEqual(deleted.call_count, 1)
+
+        with mock.patch('api.archive.delete_product', wraps=delete_product) as deleted:
+            response = self.client.post(reverse('admin:api_artisan_delete', args=[self.artisan.pk]), {'post': 'yes'})
+        self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+        self.assertEqual(deleted.call_count, 1)
+        self.assertFalse(Product.objects.exists())
+        self.assertEqual(list(OrderItem.objects.values_list('product', 'product_name')), [(None, 'Test Product')])
+
+    def test_delete_product_detaches_lines_in_batches(self):
+        for _ in range(3):
+            self.order('delivered', 1)
+        with CaptureQueriesContext(connections['default']) as queries:
+            delete_product(self.product, batch_size=2)
+        # Two id batches, then the delete's own (now empty) SET NULL.
+        updates = [q['sql'] for q in queries if q['sql'].startswith('UPDATE "api_orderitem"')]
+        self.assertEqual(['"api_orderitem"."id" IN' in sql for sql in updates], [True, True, False])
+        self.assertEqual(OrderItem.objects.filter(product__isnull=True).count(), 3)
+
+
+class UUIDv7Tests(APITestCase):
+    def test_uuid7_layout_and_ordering(self):
+        before = timezone.now()
+        ids = [uuid7() for _ in range(10000)]
+        self.assertTrue(all(value.version == 7 and value.variant == uuid.RFC_4122 for value in ids))
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual(len(set(ids)), len(ids))
+        self.assertLess(abs((uuid7_time(ids[0]) - before).total_seconds()), 1)
+        self.assertIsNone(uuid7_time(uuid.uuid4()))
+
+    def test_new_rows_get_time_ordered_keys(self):
+        users = [
+            User.objects.create_user(email=f'user{index}@example.com', password='x', username=f'user{index}')
+            for index in range(3)
+        ]
+        self.assertTrue(all(user.id.version == 7 for user in users))
+        self.assertEqual(list(User.objects.order_by('id')), users)
+
+    def test_benchmark_restores_defaults_and_rolls_back(self):
+        output = io.StringIO()
+        call_command('bench_uuid_keys', '--orders', '5', '--products', '5', stdout=output)
+        self.assertIn('v4', output.getvalue())
+        self.assertIn('v7', output.getvalue())
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(Order._meta.pk.get_default().version, 7)
+
+
+class ValuesSerializerTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            password='testpass123',
+            name='Test User',
+            username='test'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.artisan = Artisan.objects.create(
+            user=self.user,
+            business_name='Test Shop',
+            description='Test Description',
+            location='Lagos',
+            latitude=6.6018,
+            longitude=3.3515
+        )
+        self.products = [
+            Product.objects.create(artisan=self.artisan, name=f'Product {index}', description='Test Description',
+                                   price=f'{index}9.99', inventory=index)
+            for index in range(4)
+        ]
+        Product.objects.filter(pk=self.products[1].pk).update(reserved=1, image='products/basket.jpg')
+        for names in (['Product 1', 'Product 2'], ['Product 3']):
+            order = Order.objects.create(user=self.user, total_amount='10.00', status='delivered')
+            for product in Product.objects.filter(name__in=names):
+                OrderItem.objects.create(order=order, product=product, product_name=product.name,
+                                         quantity=2, price=product.price)
+        self.products[3].delete()
+        self.context = {'request': APIRequestFactory().get('/')}
+
+    def assert_parity(self, serializer_class, queryset):
+        plan = SerializerPlan.for_serializer(serializer_class)
+        fast = plan.to_data(list(plan.queryset(queryset)), self.context)
+        slow = serializer_class(queryset, many=True, context=self.context).data
+        self.assertEqual(fast, slow)
+        self.assertEqual(FastJSONRenderer().render(fast), FastJSONRenderer().render(slow))
+
+    def test_product_plan_matches_serializer(self):
+        self.assert_parity(ProductSerializer, Product.objects.order_by('name'))
+
+    def test_order_plan_matches_serializer(self):
+        # Includes a line whose product was deleted.
+        self.assert_parity(OrderSerializer, Order.objects.order_by('created_at'))
+
+    def test_unsupported_fields_are_rejected(self):
+        with self.assertRaises(ImproperlyConfigured):
+            SerializerPlan(ArtisanSerializer)
+
+    def list_both_ways(self, url, params):
+        responses = []
+        for enabled in (False, True):
+            with override_settings(VALUES_LIST_SERIALIZATION=enabled):
+                cache.clear()
+                with CaptureQueriesContext(connections['default']) as queries:
+                    response = self.client.get(url, params)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                responses.append((response.content, len(queries)))
+        (slow, slow_queries), (fast, fast_queries) = responses
+        self.assertEqual(fast, slow)
+        return slow_queries, fast_queries
+
+    def test_list_endpoints_match_with_filters_and_facets(self):
+        self.list_both_ways(reverse('product-list'), {'facets': 'true', 'in_stock': 'true', 'ordering': '-price'})
+        self.list_both_ways(reverse('product-list'), {'near': '6.60,3.35', 'radius': 10})
+        self.list_both_ways(reverse('product-list'), {'search': 'Product 1'})
+        slow_queries, fast_queries = self.list_both_ways(reverse('order-list'), {'ordering': 'created_at'})
+        self.assertLess(fast_queries, slow_queries)
@@ -0,0 +1,159 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    """
+    Cache-backed token bucket. A rate of 'N/period' allows bursts of N
+    requests and refills at N per period, so clients are not locked out for
+    a whole window once they hit the limit.
+
+    The scope comes from the view's `throttle_scope`, falling back to the
+    class `scope`. Views without either are not throttled.
+
+    Each bucket is read and written under a short cache lock (`cache.add`
+    is atomic on every backend), so concurrent requests cannot spend the
+    same token. If the lock stays taken (say, by a worker that died holding
+    it), the bucket is used without it rather than throttling a client that
+    may be under its limit; requests racing without it may then spend the
+    same token.
+    """
+    scope_attr = 'throttle_scope'
+    ident_kind = None
+    rate_suffix = ''
+    # Seconds before an abandoned lock lapses; it is held for two cache calls.
+    lock_timeout = 1
+    lock_attempts = 50
+
+    def __init__(self):
+        # The rate depends on the view, so it is resolved in allow_request().
+        self.wait_seconds = None
+
+    def get_rate(self):
+        return self.THROTTLE_RATES.get(self.scope + self.rate_suffix) or super().get_rate()
+
+    def get_ident_value(self, request):
+        raise NotImplementedError('.get_ident_value() must be overridden')
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {
+            'scope': self.scope,
+            'ident': '%s_%s' % (self.ident_kind, self.get_ident_value(request)),
+        }
+
+    def allow_request(self, request, view):
+        self.scope = getattr(view, self.scope_attr, None) or type(self).scope
+        if not self.scope:
+            return True
+
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        if self.num_requests is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        refill_per_second = self.num_requests / self.duration
+        with self._bucket_lock():
+            now = self.timer()
+            tokens, updated_at = self.cache.get(self.key, (self.num_requests, now))
+            tokens = min(self.num_requests, tokens + (now - updated_at) * refill_per_second)
+
+            if tokens < 1:
+                self.wait_seconds = (1 - tokens) / refill_per_second
+                return False
+
+            # A bucket left alone for `duration` is full again, which is also
+            # what a missing key means.
+            self.cache.set(self.key, (tokens - 1, now), self.duration)
+        return True
+
+    @contextmanager
+    def _bucket_lock(self):
+        lock_key = self.key + ':lock'
+        for _ in range(self.lock_attempts):
+            if self.cache.add(lock_key, 1, self.lock_timeout):
+                break
+            time.sleep(0.001)
+        else:
+            yield
+            return
+        try:
+            yield
+        finally:
+            self.cache.delete(lock_key)
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class UserTokenBucketThrottle(TokenBucketThrottle):
+    """
+    One bucket per authenticated user, or per client IP for anonymous requests.
+    """
+    ident_kind = 'user'
+
+    def get_ident_value(self, request):
+        if request.user and request.user.is_authenticated:
+            return request.user.pk
+        return self.get_ident(request)
+
+
+class IPTokenBucketThrottle(TokenBucketThrottle):
+    """
+    One bucket per client IP. Uses the '<scope>_ip' rate when configured, so
+    many users behind one NAT can get a larger allowance.
+    """
+    ident_kind = 'ip'
+    rate_suffix = '_ip'
+
+    def get_ident_value(self, request):
+        return self.get_ident(request)
+
+
+class AuthRateThrottle(IPTokenBucketThrottle):
+    scope = 'auth'
+
+
+class ServiceOverloaded(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Server is busy, please retry shortly.'
+    default_code = 'overloaded'
+
+    def __init__(self, detail=None, code=None, wait=None):
+        super().__init__(detail, code)
+        # DRF's exception handler turns `wait` into a Retry-After header.
+        self.wait = wait
+
+
+class ConcurrencyLimiter:
+    """
+    Caps the number of in-flight requests of one kind in this worker process
+    and sheds the rest with a 503 instead of letting them queue on the database.
+    """
+
+    def __init__(self, limit_setting, retry_after_setting):
+        self.limit_setting = limit_setting
+        self.retry_after_setting = retry_after_setting
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def slot(self):
+        with self._lock:
+            if self.in_flight >= getattr(settings, self.limit_setting):
+                raise ServiceOverloaded(wait=getattr(settings, self.retry_after_setting))
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+checkout_limiter = ConcurrencyLimiter('CHECKOUT_MAX_IN_FLIGHT', 'CHECKOUT_RETRY_AFTER')
@@ -1,20 +1,20 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import ArtisanViewSet, ProductViewSet, OrderViewSet, register_user
-from rest_framework_simplejwt.views import (
-    TokenObtainPairView,
-    TokenRefreshView,
-)
+from .views import ArtisanViewSet, ProductViewSet, OrderViewSet, CartViewSet, register_user, database_pool_stats, change_feed, LoginView
+from rest_framework_simplejwt.views import TokenRefreshView
 
 
 router = DefaultRouter()
 router.register(r'artisans', ArtisanViewSet)
 router.register(r'products', ProductViewSet)
 router.register(r'orders', OrderViewSet)
+router.register(r'cart', CartViewSet, basename='cart')
 
 urlpatterns = [
     path('', include(router.urls)),
     path('auth/register/', register_user, name='register'),
-    path('auth/login/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
+    path('auth/login/', LoginView.as_view(), name='token_obtain_pair'),
     path('auth/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('ops/db-pool/', database_pool_stats, name='database-pool-stats'),
+    path('changes/', change_feed, name='change-feed'),
 ]
\ No newline at end of file
@@ -0,0 +1,161 @@
+"""
+Read-only serialization from values_list() rows.
+
+A ModelSerializer builds a model instance per row and then walks its
+field objects for each one. For list pages `SerializerPlan` does that work
+once per serializer class instead. It resolves every field to a column
+(joined columns such as `artisan__business_name` included) and a
+converter, then maps plain row tuples to output dicts. Nested
+`many=True` serializers over reverse foreign keys are fetched with one
+extra query per page.
+
+Output matches the serializer's own `.data`. Fields a plan cannot express
+raise ImproperlyConfigured when the plan is compiled. Values that are
+computed in Python can be declared as query expressions in the
+serializer's `Meta.values_expressions`; prefer a model field (such as the
+generated `Product.available`) so both paths share one definition.
+"""
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import models
+from rest_framework import serializers
+from rest_framework.relations import PrimaryKeyRelatedField
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+# Fields whose to_representation() returns values() output unchanged.
+_IDENTITY_FIELDS = (serializers.CharField, serializers.IntegerField, serializers.BooleanField)
+
+
+def _file_url(model_field):
+    storage = model_field.storage
+
+    def convert(name, request):
+        if not name:
+            return None
+        url = storage.url(name)
+        return request.build_absolute_uri(url) if request is not None else url
+    return convert
+
+
+class SerializerPlan:
+    _plans = {}
+
+    def __init__(self, serializer_class):
+        meta = serializer_class.Meta
+        self.model = meta.model
+        self.expressions = dict(getattr(meta, 'values_expressions', {}))
+        self.columns = []
+        # (output name, column index, converter, needs request)
+        self.fields = []
+        # (output name, child plan, foreign key column, foreign key name)
+        self.nested = []
+        # Output keys in serializer order; each row starts from a copy.
+        self.template = {}
+
+        for name, field in serializer_class().fields.items():
+            if field.write_only:
+                continue
+            self.template[name] = None
+            if name in self.expressions:
+                self._add(name, name, field.to_representation)
+            elif isinstance(field, serializers.ListSerializer):
+                self._add_nested(name, field)
+            elif isinstance(field, PrimaryKeyRelatedField):
+                convert = field.pk_field.to_representation if field.pk_field is not None else None
+                self._add(name, field.source.replace('.', '__'), convert)
+            elif isinstance(field, serializers.FileField):
+                if getattr(field, 'use_url', api_settings.UPLOADED_FILES_USE_URL):
+                    model_field = self.model._meta.get_field(field.source)
+                    self._add(name, field.source, _file_url(model_field), needs_request=True)
+                else:
+                    self._add(name, field.source, lambda value: value or None)
+            elif isinstance(field, (serializers.SerializerMethodField, serializers.RelatedField,
+                                    serializers.Serializer)) or field.source == '*':
+                raise ImproperlyConfigured(
+                    f'{serializer_class.__name__}.{name} cannot be served from values(); '
+                    f'add it to Meta.values_expressions.')
+            else:
+                convert = None if type(field) in _IDENTITY_FIELDS else field.to_representation
+                self._add(name, field.source.replace('.', '__'), convert)
+        self.pk_index = self._column('pk')
+
+    @classmethod
+    def for_serializer(cls, serializer_class):
+        plan = cls._plans.get(serializer_class)
+        if plan is None:
+            plan = cls._plans[serializer_class] = cls(serializer_class)
+        return plan
+
+    def _column(self, key):
+        if key not in self.columns:
+            self.columns.append(key)
+        return self.columns.index(key)
+
+    def _add(self, name, key, convert, needs_request=False):
+        self.fields.append((name, self._column(key), convert, needs_request))
+
+    def _add_nested(self, name, field):
+        child = field.child
+        if not isinstance(child, serializers.ModelSerializer):
+            raise ImproperlyConfigured(f'{name}: only nested ModelSerializers are supported.')
+        relation = self.model._meta.get_field(field.source)
+        if not isinstance(relation, models.ManyToOneRel):
+            raise ImproperlyConfigured(f'{name}: only reverse foreign keys can be nested.')
+        plan = SerializerPlan.for_serializer(type(child))
+        self.nested.append((name, plan, plan._column(relation.field.attname), relation.field.name))
+
+    def queryset(self, queryset):
+        """
+        Turn `queryset` (filtered and ordered as usual) into the rows this
+        plan reads.
+        """
+        if self.expressions:
+            queryset = queryset.annotate(**self.expressions)
+        return queryset.values_list(*self.columns)
+
+    def to_data(self, rows, context=None):
+        request = (context or {}).get('request')
+        fields = [
+            (name, index, (lambda value, convert=convert: convert(value, request)) if needs_request else convert)
+            for name, index, convert, needs_request in self.fields
+        ]
+        data = []
+        template = self.template
+        for row in rows:
+            item = template.copy()
+            for name, index, convert in fields:
+                value = row[index]
+                item[name] = value if value is None or convert is None else convert(value)
+            data.append(item)
+
+        if self.nested and data:
+            keys = [row[self.pk_index] for row in rows]
+            for name, plan, parent_index, parent_field in self.nested:
+                children = {key: [] for key in keys}
+                # Default manager ordering, as `parent.items.all()` would use.
+                queryset = plan.model._default_manager.filter(**{f'{parent_field}__in': keys})
+                child_rows = list(plan.queryset(queryset))
+                for child_row, child_item in zip(child_rows, plan.to_data(child_rows, context)):
+                    children[child_row[parent_index]].append(child_item)
+                for key, item in zip(keys, data):
+                    item[name] = children[key]
+        return data
+
+
+class ValuesListMixin:
+    """
+    Serve `list` through a SerializerPlan of the view's serializer when
+    VALUES_LIST_SERIALIZATION is enabled.
+    """
+
+    def list(self, request, *args, **kwargs):
+        if not settings.VALUES_LIST_SERIALIZATION:
+            return super().list(request, *args, **kwargs)
+        plan = SerializerPlan.for_serializer(self.get_serializer_class())
+        queryset = plan.queryset(self.filter_queryset(self.get_queryset()))
+        context = self.get_serializer_context()
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(plan.to_data(page, context))
+        return Response(plan.to_data(list(queryset), context))
@@ -1,13 +1,30 @@
 from rest_framework import viewsets, filters, mixins, status, serializers
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import action, api_view, permission_classes, throttle_classes
+from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
+from django.conf import settings
+from django.db import connections
 from django_filters.rest_framework import DjangoFilterBackend
-from drf_spectacular.utils import extend_schema, OpenApiResponse
-from .models import Artisan, Product, Order
-from .serializers import ArtisanSerializer, ProductSerializer, OrderSerializer, UserCreateSerializer, UserSerializer
+from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiResponse
+from .models import Artisan, Product, Order, ArchivedOrder, Cart
+from .serializers import (
+    ArtisanSerializer, ProductSerializer, OrderSerializer, ArchivedOrderSerializer, UserCreateSerializer, UserSerializer,
+    CartSerializer, CartItemSerializer,
+)
+from .filters import ProductFilter, NearFilterBackend, product_facets
+from .archive import delete_artisan, delete_product
+from .cart import add_to_cart, remove_from_cart, checkout
+from .changes import read_changes
 from .permissions import IsArtisanOwnerOrReadOnly
+from .db_routers import ReplicaRoutingMixin
+from .idempotency import IdempotencyKeyInUse, IdempotencyKeyReused, idempotent
+from .jobs import enqueue
+from .tasks import process_product_image
+from .throttling import AuthRateThrottle, UserTokenBucketThrottle, IPTokenBucketThrottle, checkout_limiter
+from .values_serializers import ValuesListMixin
 from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.views import TokenObtainPairView
 
 
 @extend_schema(
@@ -23,6 +40,7 @@ from rest_framework_simplejwt.tokens import RefreshToken
 )
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes([AuthRateThrottle])
 def register_user(request):
     serializer = UserCreateSerializer(data=request.data)
     try:
@@ -54,12 +72,69 @@ def register_user(request):
             'message': str(e)
         }, status=status.HTTP_400_BAD_REQUEST)
 
+@extend_schema(tags=['authentication'])
+class LoginView(TokenObtainPairView):
+    # Password hashing makes login expensive; throttle it per client IP.
+    throttle_classes = [AuthRateThrottle]
+
+
+@extend_schema(tags=['ops'])
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def database_pool_stats(request):
+    # Pools are per process, so these numbers describe the worker that
+    # served this request.
+    data = {}
+    for alias in connections:
+        connection = connections[alias]
+        if hasattr(connection, 'pool_stats'):
+            data[alias] = connection.pool_stats()
+    return Response({
+        'status': 'success',
+        'data': data
+    })
+
+
+@extend_schema(
+    tags=['ops'],
+    parameters=[
+        OpenApiParameter('since', int, description='Cursor returned by the previous page; 0 to start'),
+        OpenApiParameter('limit', int, description='Maximum number of changes to return'),
+    ],
+)
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def change_feed(request):
+    # Downstream sync: artisan, product and order changes after `since`,
+    # oldest first. Store `cursor` and pass it back as `since`.
+    try:
+        since = int(request.query_params.get('since', 0))
+        limit = int(request.query_params.get('limit', settings.CHANGE_FEED_PAGE_SIZE))
+        if since < 0 or limit <= 0:
+            raise ValueError
+    except ValueError:
+        return Response({
+            'status': 'error',
+            'message': 'since and limit must be non-negative integers'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    results, cursor, has_more = read_changes(
+        since, min(limit, settings.CHANGE_FEED_MAX_PAGE_SIZE), context={'request': request})
+    return Response({
+        'cursor': cursor,
+        'has_more': has_more,
+        'results': results,
+    })
+
+
 @extend_schema(tags=['artisans'])
-class ArtisanViewSet(viewsets.ModelViewSet):
+class ArtisanViewSet(ReplicaRoutingMixin, viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     queryset = Artisan.objects.all()
     serializer_class = ArtisanSerializer
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
+    throttle_classes = [UserTokenBucketThrottle, IPTokenBucketThrottle]
+    throttle_scope = 'catalogue'
+    filter_backends = [filters.SearchFilter, NearFilterBackend, filters.OrderingFilter]
     search_fields = ['business_name', 'description', 'location']
     ordering_fields = ['business_name', 'created_at']
 
@@ -69,6 +144,9 @@ class ArtisanViewSet(viewsets.ModelViewSet):
             raise serializers.ValidationError("User already has an artisan profile")
         serializer.save(user=self.request.user)
 
+    def perform_destroy(self, instance):
+        delete_artisan(instance)
+
     def get_queryset(self):
         # For list view, show all artisans
         # For other operations, only show the user's artisan profile
@@ -78,35 +156,154 @@ class ArtisanViewSet(viewsets.ModelViewSet):
 
 
 @extend_schema(tags=['products'])
-class ProductViewSet(viewsets.ModelViewSet):
+class ProductViewSet(ReplicaRoutingMixin, ValuesListMixin, viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated, IsArtisanOwnerOrReadOnly]
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    filterset_fields = ['artisan', 'price']
+    throttle_classes = [UserTokenBucketThrottle, IPTokenBucketThrottle]
+    throttle_scope = 'catalogue'
+    filter_backends = [DjangoFilterBackend, filters.SearchFilter, NearFilterBackend, filters.OrderingFilter]
+    near_field_prefix = 'artisan__'
+    filterset_class = ProductFilter
     search_fields = ['name', 'description']
     ordering_fields = ['name', 'price', 'created_at']
 
+    def perform_create(self, serializer):
+        product = serializer.save()
+        if product.image:
+            enqueue(process_product_image, str(product.pk))
+
+    def perform_update(self, serializer):
+        product = serializer.save()
+        if product.image and 'image' in serializer.validated_data:
+            enqueue(process_product_image, str(product.pk))
+
+    def perform_destroy(self, instance):
+        delete_product(instance)
+
+    @extend_schema(responses=ProductSerializer(many=True))
+    @action(detail=True, methods=['get'])
+    def related(self, request, pk=None):
+        # Precomputed by build_recommendations; served by an indexed lookup.
+        product = self.get_object()
+        products = (Product.objects.filter(related_to__product=product)
+                    .select_related('artisan')
+                    .order_by('related_to__rank'))
+        return Response(ProductSerializer(products, many=True, context=self.get_serializer_context()).data)
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        if request.query_params.get('facets') in ('1', 'true'):
+            response.data['facets'] = product_facets(request, self.filter_queryset(self.get_queryset()))
+        return response
+
 
 @extend_schema(tags=['orders'])
-class OrderViewSet(viewsets.GenericViewSet, 
+class OrderViewSet(ReplicaRoutingMixin,
+                  ValuesListMixin,
+                  viewsets.GenericViewSet, 
                   mixins.ListModelMixin,
                   mixins.CreateModelMixin):
+    # Orders are always read from the primary; the mixin only pins the
+    # user there after checkout so catalogue reads see the new inventory.
+    read_from_replica = False
     permission_classes = [IsAuthenticated]
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ['status']
     ordering_fields = ['created_at', 'total_amount']
+    throttle_classes = [UserTokenBucketThrottle, IPTokenBucketThrottle]
+
+    @property
+    def throttle_scope(self):
+        # Only checkout is throttled; listing orders is cheap.
+        return 'checkout' if self.action == 'create' else None
 
     def get_queryset(self):
         return Order.objects.filter(user=self.request.user)
 
+    @extend_schema(responses=ArchivedOrderSerializer(many=True))
+    @action(detail=False, methods=['get'])
+    def archived(self, request):
+        # Orders moved out by archive_orders; same filters and ordering.
+        queryset = self.filter_queryset(ArchivedOrder.objects.filter(user=request.user).select_related('user'))
+        page = self.paginate_queryset(queryset)
+        serializer = ArchivedOrderSerializer(page, many=True, context=self.get_serializer_context())
+        return self.get_paginated_response(serializer.data)
+
+    @extend_schema(responses=ArchivedOrderSerializer)
+    @action(detail=False, methods=['get'], url_path=r'archived/(?P<order_id>[^/.]+)')
+    def archived_detail(self, request, order_id=None):
+        order = get_object_or_404(ArchivedOrder.objects.select_related('user'), pk=order_id, user=request.user)
+        return Response(ArchivedOrderSerializer(order, context=self.get_serializer_context()).data)
+
     def create(self, request, *args, **kwargs):
-        try:
-            return super().create(request, *args, **kwargs)
-        except Exception as e:
+        # Shed load before doing any work once too many checkouts are in
+        # flight; ServiceOverloaded becomes a 503 with Retry-After.
+        with checkout_limiter.slot():
+            try:
+                return self._create(request, *args, **kwargs)
+            except (IdempotencyKeyInUse, IdempotencyKeyReused):
+                raise
+            except Exception as e:
+                return Response({
+                    'status': 'error',
+                    'message': str(e)
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+    # Inside the error handling above, so failures release the key instead
+    # of being stored as a 400 and replayed.
+    @idempotent
+    def _create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
+
+@extend_schema(tags=['cart'])
+class CartViewSet(ReplicaRoutingMixin, viewsets.GenericViewSet):
+    # Carts are read from the primary; the mixin pins the user there after
+    # checkout like OrderViewSet does.
+    read_from_replica = False
+    permission_classes = [IsAuthenticated]
+    serializer_class = CartSerializer
+    throttle_classes = [UserTokenBucketThrottle, IPTokenBucketThrottle]
+
+    @property
+    def throttle_scope(self):
+        return 'checkout' if self.action == 'checkout' else 'catalogue'
+
+    def get_cart_response(self, status_code=status.HTTP_200_OK):
+        cart, _ = Cart.objects.get_or_create(user=self.request.user)
+        cart = Cart.objects.prefetch_related('items__product').get(pk=cart.pk)
+        return Response(CartSerializer(cart, context=self.get_serializer_context()).data, status=status_code)
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cart_response()
+
+    @extend_schema(request=CartItemSerializer, responses=CartSerializer)
+    @action(detail=False, methods=['post'], url_path='items')
+    def add_item(self, request):
+        serializer = CartItemSerializer(data=request.data, context=self.get_serializer_context())
+        serializer.is_valid(raise_exception=True)
+        add_to_cart(request.user, serializer.validated_data['product'], serializer.validated_data['quantity'])
+        return self.get_cart_response(status.HTTP_201_CREATED)
+
+    @extend_schema(request=None, responses=CartSerializer)
+    @action(detail=False, methods=['delete'], url_path=r'items/(?P<item_id>[^/.]+)')
+    def remove_item(self, request, item_id=None):
+        if not remove_from_cart(request.user, item_id):
             return Response({
                 'status': 'error',
-                'message': str(e)
-            }, status=status.HTTP_400_BAD_REQUEST)
+                'message': 'Cart item not found'
+            }, status=status.HTTP_404_NOT_FOUND)
+        return self.get_cart_response()
+
+    @extend_schema(request=None, responses={201: OrderSerializer})
+    @action(detail=False, methods=['post'])
+    @idempotent
+    def checkout(self, request):
+        with checkout_limiter.slot():
+            order = checkout(request.user)
+        order = Order.objects.prefetch_related('items').select_related('user').get(pk=order.pk)
+        return Response(OrderSerializer(order, context=self.get_serializer_context()).data,
+                        status=status.HTTP_201_CREATED)
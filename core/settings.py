@@ -11,7 +11,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
 import dj_database_url
-from decouple import config
+from decouple import config, Csv
 from pathlib import Path
 from datetime import timedelta
 
@@ -131,14 +131,61 @@ SPECTACULAR_SETTINGS = {
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+DATABASE_POOL = config('DATABASE_POOL', default=False, cast=bool)
+DATABASE_CONN_HEALTH_CHECKS = config('DATABASE_CONN_HEALTH_CHECKS', default=True, cast=bool)
+
 DATABASES = {
     'default': dj_database_url.config(
         default=config('DATABASE_URL'),
         conn_max_age=600,
-        conn_health_checks=True,
+        conn_health_checks=DATABASE_CONN_HEALTH_CHECKS,
     )
 }
 
+# Optional read replicas, e.g. DATABASE_REPLICA_URLS=postgres://...,postgres://...
+# Safe-method catalogue reads go to a healthy replica; see api/db_routers.py.
+for index, url in enumerate(config('DATABASE_REPLICA_URLS', default='', cast=Csv())):
+    DATABASES[f'replica_{index}'] = dj_database_url.parse(
+        url,
+        conn_max_age=600,
+        conn_health_checks=DATABASE_CONN_HEALTH_CHECKS,
+        test_options={'MIRROR': 'default'},
+    )
+
+# Optional psycopg 3 connection pool for PostgreSQL (pip install "psycopg[binary,pool]").
+# Replaces per-thread persistent connections; pooled connections are only
+# health-checked on checkout after sitting idle for DATABASE_POOL_CHECK_IDLE seconds.
+if DATABASE_POOL:
+    for database in DATABASES.values():
+        database.update(ENGINE='api.db_backends.postgresql', CONN_MAX_AGE=0, CONN_HEALTH_CHECKS=False)
+        database.setdefault('OPTIONS', {})['pool'] = {
+            'min_size': config('DATABASE_POOL_MIN_SIZE', default=2, cast=int),
+            'max_size': config('DATABASE_POOL_MAX_SIZE', default=10, cast=int),
+            'timeout': config('DATABASE_POOL_TIMEOUT', default=10, cast=float),
+            'max_idle': config('DATABASE_POOL_MAX_IDLE', default=300, cast=float),
+            'check_idle': config('DATABASE_POOL_CHECK_IDLE', default=30, cast=float),
+        }
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['api.db_routers.PrimaryReplicaRouter']
+
+# Seconds a user keeps reading from the primary after a write.
+REPLICA_PIN_SECONDS = config('REPLICA_PIN_SECONDS', default=10, cast=int)
+REPLICA_MAX_LAG_SECONDS = config('REPLICA_MAX_LAG_SECONDS', default=5, cast=float)
+REPLICA_HEALTH_CHECK_INTERVAL = config('REPLICA_HEALTH_CHECK_INTERVAL', default=10, cast=float)
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Use a shared backend (e.g. django.core.cache.backends.redis.RedisCache)
+# when running more than one process so replica pins are seen everywhere.
+
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default=''),
+    }
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -167,6 +214,15 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
     'DEFAULT_FILTER_BACKENDS': [
@@ -174,8 +230,73 @@ REST_FRAMEWORK = {
         'rest_framework.filters.SearchFilter',
         'rest_framework.filters.OrderingFilter',
     ],
+    # Token-bucket rates per scope (see api/throttling.py). '<scope>_ip' rates
+    # apply to the per-IP bucket and default to the scope's own rate.
+    'DEFAULT_THROTTLE_RATES': {
+        'auth': config('THROTTLE_AUTH_RATE', default='10/min'),
+        'checkout': config('THROTTLE_CHECKOUT_RATE', default='20/min'),
+        'checkout_ip': config('THROTTLE_CHECKOUT_IP_RATE', default='120/min'),
+        'catalogue': config('THROTTLE_CATALOGUE_RATE', default='300/min'),
+        'catalogue_ip': config('THROTTLE_CATALOGUE_IP_RATE', default='1200/min'),
+    },
 }
 
+# Admission control: checkouts allowed in flight per worker process before
+# new ones are answered with 503 and Retry-After.
+CHECKOUT_MAX_IN_FLIGHT = config('CHECKOUT_MAX_IN_FLIGHT', default=16, cast=int)
+CHECKOUT_RETRY_AFTER = config('CHECKOUT_RETRY_AFTER', default=2, cast=int)
+
+# Seconds a cart item holds its units before the sweeper releases them.
+CART_HOLD_SECONDS = config('CART_HOLD_SECONDS', default=15 * 60, cast=int)
+
+# Product list facets (?facets=true): upper bounds of the price buckets and
+# how long each filter combination's counts are cached.
+PRODUCT_PRICE_BUCKETS = config('PRODUCT_PRICE_BUCKETS', default='25,50,100,250', cast=Csv(cast=int))
+PRODUCT_FACETS_CACHE_SECONDS = config('PRODUCT_FACETS_CACHE_SECONDS', default=60, cast=int)
+
+# ?near=lat,lng&radius=km on artisan and product lists.
+NEAR_DEFAULT_RADIUS_KM = config('NEAR_DEFAULT_RADIUS_KM', default=25, cast=float)
+NEAR_MAX_RADIUS_KM = config('NEAR_MAX_RADIUS_KM', default=500, cast=float)
+
+# Background jobs (manage.py run_worker, see api/jobs.py).
+JOB_RETRY_BASE_SECONDS = config('JOB_RETRY_BASE_SECONDS', default=10, cast=int)
+JOB_RETRY_MAX_SECONDS = config('JOB_RETRY_MAX_SECONDS', default=60 * 60, cast=int)
+JOB_LOCK_TIMEOUT_SECONDS = config('JOB_LOCK_TIMEOUT_SECONDS', default=15 * 60, cast=int)
+JOB_RETENTION_DAYS = config('JOB_RETENTION_DAYS', default=7, cast=int)
+PRODUCT_IMAGE_MAX_SIZE = config('PRODUCT_IMAGE_MAX_SIZE', default=1600, cast=int)
+
+EMAIL_BACKEND = config('EMAIL_BACKEND', default='django.core.mail.backends.console.EmailBackend')
+DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='orders@localhost')
+
+# Idempotency-Key handling for order creation (see api/idempotency.py).
+IDEMPOTENCY_KEY_TTL = config('IDEMPOTENCY_KEY_TTL', default=24 * 60 * 60, cast=int)
+# How long a duplicate waits for the first request's response before getting 409.
+IDEMPOTENCY_WAIT_TIMEOUT = config('IDEMPOTENCY_WAIT_TIMEOUT', default=5, cast=float)
+IDEMPOTENCY_POLL_INTERVAL = 0.1
+# A request that holds a key longer than this is presumed dead; a retry takes it over.
+IDEMPOTENCY_LEASE_SECONDS = config('IDEMPOTENCY_LEASE_SECONDS', default=60, cast=int)
+
+# "Frequently bought together" lists (see api/recommendations.py).
+RECOMMENDATION_TOP_K = config('RECOMMENDATION_TOP_K', default=10, cast=int)
+RECOMMENDATION_MAX_BASKET = config('RECOMMENDATION_MAX_BASKET', default=50, cast=int)
+
+# Closed orders older than this move to ArchivedOrder (see api/archive.py).
+ORDER_ARCHIVE_AFTER_DAYS = config('ORDER_ARCHIVE_AFTER_DAYS', default=365, cast=int)
+
+# Serve product and order lists from values() rows through a precompiled
+# serializer plan (see api/values_serializers.py).
+VALUES_LIST_SERIALIZATION = config('VALUES_LIST_SERIALIZATION', default=False, cast=bool)
+
+# Admin changelists show PostgreSQL planner estimates above this many rows
+# (see api/pagination.py).
+ADMIN_EXACT_COUNT_THRESHOLD = config('ADMIN_EXACT_COUNT_THRESHOLD', default=10000, cast=int)
+
+# /changes/ feed for downstream sync (see api/changes.py).
+CHANGE_FEED_PAGE_SIZE = config('CHANGE_FEED_PAGE_SIZE', default=500, cast=int)
+CHANGE_FEED_MAX_PAGE_SIZE = config('CHANGE_FEED_MAX_PAGE_SIZE', default=5000, cast=int)
+CHANGE_FEED_COMPACT_AFTER_SECONDS = config('CHANGE_FEED_COMPACT_AFTER_SECONDS', default=24 * 60 * 60, cast=int)
+CHANGE_FEED_TOMBSTONE_DAYS = config('CHANGE_FEED_TOMBSTONE_DAYS', default=30, cast=int)
+
 JWT_SIGNING_KEY = config('JWT_SECRET_KEY')
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(days=7),